@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The agents are flat modules imported by name, and read ~/.factory at import time
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ['HOME'] = tempfile.mkdtemp(prefix='toon-tests-')
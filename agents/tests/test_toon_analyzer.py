@@ -0,0 +1,18 @@
+from toon_core_system import TOONAnalyzer, serialize_payload
+from toon_format import encode_toon
+
+def test_node_budget_is_shared_across_medium_containers():
+    # 200 lists of 500 rows: each list is under the sampling threshold on its own
+    document = {f'group{i}': [{'id': j, 'name': f'user{j}', 'ok': True} for j in range(500)] for i in range(200)}
+    serialized = serialize_payload(document)
+    analysis = TOONAnalyzer(None).analyze(document, serialized)
+
+    assert analysis['sampled']
+    assert analysis['visited_nodes'] <= 0.06 * len(serialized) / TOONAnalyzer.CHARS_PER_NODE
+    assert abs(analysis['estimated_toon_size'] / len(encode_toon(document)) - 1) < 0.1
+
+def test_small_payloads_are_walked_in_full():
+    document = {'rows': [{'id': j, 'tags': ['a', 'b']} for j in range(50)]}
+    analysis = TOONAnalyzer(None).analyze(document, serialize_payload(document))
+    assert not analysis['sampled']
+    assert analysis['data_size'] == len(serialize_payload(document))
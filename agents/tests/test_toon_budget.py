@@ -0,0 +1,22 @@
+import pytest
+
+from toon_core_system import TOONBudgetCompressor
+
+ROWS = [{'id': i, 'name': f'user number {i}', 'bio': 'x' * 80} for i in range(20)]
+
+@pytest.mark.parametrize('budget', [1, 5, 10, 15, 20, 40])
+def test_small_budgets_keep_the_container_type(budget):
+    compressed, stats = TOONBudgetCompressor().compress(ROWS, budget)
+    assert isinstance(compressed, list) and compressed
+    assert stats['compressed']
+
+def test_dict_that_cannot_fit_becomes_an_omission_marker():
+    compressed, stats = TOONBudgetCompressor().compress({'body': 'y' * 500}, 3)
+    assert compressed == {'_omitted': '1 fields omitted'}
+    assert stats['omitted_fields'] == 1
+
+def test_unfittable_string_is_left_unchanged():
+    text = 'z' * 500
+    compressed, stats = TOONBudgetCompressor().compress(text, 3)
+    assert compressed is text
+    assert not stats['compressed']
@@ -0,0 +1,15 @@
+from toon_core_system import get_toon_core_system, meets_savings_threshold
+
+def test_exact_threshold():
+    assert meets_savings_threshold(100, 85, 15)
+    assert not meets_savings_threshold(100, 86, 15)
+    assert not meets_savings_threshold(100, 100, 0)
+    assert not meets_savings_threshold(0, 0, 0)
+
+def test_conversion_that_costs_tokens_is_rejected():
+    # Nested objects of mixed lists encode longer in TOON than in compact JSON
+    payload = {'items': [{'kind': 'a', 'children': [1, {'x': [2, 3]}, 'text']} for _ in range(30)]}
+    data, info = get_toon_core_system().convert_to_toon(payload, {})
+    assert info['rejected']
+    assert info['tokens_saved'] <= 0 or info['savings_percent'] < 15
+    assert data is payload
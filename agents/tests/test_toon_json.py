@@ -0,0 +1,51 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+import toon_json
+from toon_core_system import get_toon_core_system
+
+ROWS = [{'id': i, 'name': f'user{i}', 'role': 'admin' if i % 3 else 'member', 'score': i * 7} for i in range(200)]
+
+@pytest.fixture(scope='module', autouse=True)
+def toon_enabled():
+    settings_path = Path(os.environ['HOME']) / '.factory' / 'settings.json'
+    settings_path.parent.mkdir(parents=True, exist_ok=True)
+    # A small config budget must not leak into dumps(), which has to stay lossless
+    settings_path.write_text(json.dumps({'toonIntegration': {
+        'enabled': True, 'contextTokenBudget': 50, 'configHotReload': False
+    }}))
+    core = get_toon_core_system()
+    core.config_service.reload()
+    assert core.config.get('enabled')
+    return core
+
+@pytest.mark.parametrize('document', [
+    ROWS,
+    {'first key': 'needs quoting', 'rows': ROWS},
+    {'"quoted"': 1, 'rows': ROWS, 'nested': {'a b': [1, 2, 3], 'c': 'x: y'}},
+], ids=['top-level-list', 'quoted-first-key', 'quoted-nested-keys'])
+def test_round_trip(document):
+    text = toon_json.dumps(document)
+    assert text != json.dumps(document)
+    assert toon_json.loads(text) == document
+
+def test_repeated_dumps_with_delta_requested():
+    document = {'rows': ROWS}
+    changed = {'rows': ROWS[:-1] + [{**ROWS[-1], 'score': -1}]}
+    for payload in (document, document, changed, changed):
+        assert toon_json.loads(toon_json.dumps(payload, context={'delta': True})) == payload
+
+def test_invalid_text_raises_json_error():
+    for text in ('{bad json', 'plain words', '', '[1, 2'):
+        with pytest.raises(json.JSONDecodeError):
+            toon_json.loads(text)
+
+def test_floats_keep_their_json_form():
+    document = {'rows': [{'id': i, 'ratio': float(i), 'scale': i / 4, 'big': 1e20 + i, 'zero': -0.0}
+                         for i in range(100)]}
+    text = toon_json.dumps(document)
+    assert text != json.dumps(document)
+    assert json.dumps(toon_json.loads(text)) == json.dumps(json.loads(json.dumps(document)))
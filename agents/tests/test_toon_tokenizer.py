@@ -0,0 +1,57 @@
+import base64
+import json
+import re
+
+import pytest
+
+import toon_tokenizer
+from toon_format import encode_toon
+from toon_tokenizer import BPETokenizer, TokenCounter
+
+SAMPLE = {
+    'users': [
+        {'id': i, 'name': f'user{i}', 'role': 'admin' if i % 3 else 'member', 'note': "it's fine\n  ok"}
+        for i in range(40)
+    ],
+    'meta': {'count': 40, 'path': 'src/pkg/module.py', 'ratio': 0.125, 'empty': '', 'tags': ['a', 'b']}
+}
+
+TEXTS = [
+    encode_toon(SAMPLE),
+    json.dumps(SAMPLE),
+    json.dumps(SAMPLE, indent=2),
+    'trailing spaces   \n\n\n  and lines\r\n',
+    "We'll see 12345678 items__under_scores ,name;value",
+]
+
+def build_ranks(texts):
+    """All single bytes plus every 2-4 byte substring of the texts, in a fixed order"""
+    ranks = {bytes([i]): i for i in range(256)}
+    for text in texts:
+        data = text.encode('utf-8')
+        for size in (2, 3, 4):
+            for start in range(0, len(data) - size + 1, size - 1):
+                ranks.setdefault(data[start:start + size], len(ranks))
+    return ranks
+
+@pytest.fixture
+def bpe_counter(tmp_path):
+    ranks = build_ranks(TEXTS[:2])
+    vocab_path = tmp_path / 'vocab.tiktoken'
+    vocab_path.write_text(''.join(f'{base64.b64encode(token).decode()} {rank}\n' for token, rank in ranks.items()))
+    return ranks, TokenCounter(BPETokenizer(vocab_path))
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_piece_sum_matches_full_encode(bpe_counter, text):
+    tiktoken = pytest.importorskip('tiktoken')
+    ranks, counter = bpe_counter
+    encoding = tiktoken.Encoding('toon-test', pat_str=toon_tokenizer.CL100K_PATTERN,
+                                 mergeable_ranks=ranks, special_tokens={})
+    assert counter.count(text) == len(encoding.encode_ordinary(text))
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_stdlib_pattern_matches_cl100k_split(text):
+    regex = pytest.importorskip('regex')
+    expected = regex.findall(toon_tokenizer.CL100K_PATTERN, text)
+    assert re.findall(toon_tokenizer._CL100K_STDLIB_PATTERN, text) == expected
+    assert ''.join(expected) == text
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+TOON Benchmarks
+Measures startup cost, conversion throughput and JSON hook overhead of the TOON subsystem
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+import subprocess
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Any, Callable
+
+AGENTS_PATH = Path(__file__).resolve().parent
+DEFAULT_CORPUS_PATH = AGENTS_PATH.parent / 'claude_sync' / 'projects'
+
+# Runs in a fresh interpreter so nothing is already imported or initialized
+STARTUP_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import toon_core_system
+imported = time.perf_counter()
+core = toon_core_system.get_toon_core_system()
+constructed = time.perf_counter()
+payload = {"users": [{"id": i, "name": "user%d" % i, "role": "member"} for i in range(50)]}
+core.intercept_all_data(payload, {"source": "benchmark"})
+converted = time.perf_counter()
+import threading
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "init_ms": (constructed - imported) * 1000,
+    "first_conversion_ms": (converted - constructed) * 1000,
+    "total_ms": (converted - start) * 1000,
+    "threads": threading.active_count()
+}))
+'''
+
+def run_startup_probe() -> Dict[str, Any]:
+    """Time import, construction and first conversion in a new process"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(AGENTS_PATH), os.environ.get('PYTHONPATH')])))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_PROBE],
+        capture_output=True, text=True, env=env, check=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample['process_ms'] = wall_ms
+    return sample
+
+def benchmark_startup(runs: int = 10) -> Dict[str, Any]:
+    """Report median and best startup timings over several fresh processes"""
+    # The first process compiles bytecode; it is discarded so runs measure a warm install
+    run_startup_probe()
+    samples: List[Dict[str, Any]] = [run_startup_probe() for _ in range(runs)]
+
+    report = {'runs': runs}
+    for metric in ('import_ms', 'init_ms', 'first_conversion_ms', 'total_ms', 'process_ms'):
+        values = [sample[metric] for sample in samples]
+        report[metric] = {
+            'median': round(statistics.median(values), 3),
+            'min': round(min(values), 3)
+        }
+    report['threads_after_first_conversion'] = max(sample['threads'] for sample in samples)
+    return report
+
+def synthetic_corpora(seed: int = 7) -> Dict[str, List[Any]]:
+    """Deterministic payload shapes that stress different encoder paths"""
+    rng = random.Random(seed)
+    statuses = ['modified', 'added', 'deleted', 'renamed']
+
+    wide_tables = [
+        {'rows': [{f'col_{c}': rng.choice([rng.randint(0, 10 ** 6), f'value_{rng.randint(0, 50)}', None, True])
+                   for c in range(24)} for _ in range(500)]}
+        for _ in range(8)
+    ]
+
+    def nested(depth: int) -> Any:
+        if depth == 0:
+            return {'leaf': rng.randint(0, 100), 'label': f'node_{rng.randint(0, 1000)}'}
+        return {'level': depth, 'children': [nested(depth - 1) for _ in range(2)], 'meta': {'depth': depth}}
+
+    deep_nesting = [nested(8) for _ in range(8)]
+
+    mixed_lists = [
+        {'items': [rng.choice([
+            {'path': f'src/pkg_{rng.randint(0, 9)}/module_{i}.py', 'status': rng.choice(statuses)},
+            [rng.randint(0, 9) for _ in range(5)],
+            f'plain string {i}',
+            {'nested': {'values': [1, 2, 3], 'flag': False}}
+        ]) for i in range(400)]}
+        for _ in range(8)
+    ]
+
+    small_objects = [
+        {'id': i, 'name': f'user_{i}', 'role': rng.choice(['admin', 'member']), 'active': bool(i % 2)}
+        for i in range(2000)
+    ]
+
+    return {
+        'wide_tables': wide_tables,
+        'deep_nesting': deep_nesting,
+        'mixed_lists': mixed_lists,
+        'small_objects': small_objects
+    }
+
+def recorded_corpus(path: Path = DEFAULT_CORPUS_PATH, limit: int = None) -> List[Any]:
+    """Transcript records from claude_sync/projects/*/*.jsonl"""
+    payloads = []
+    for file_path in sorted(Path(path).glob('**/*.jsonl')):
+        with open(file_path, 'r', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    payloads.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+                if limit is not None and len(payloads) >= limit:
+                    return payloads
+    return payloads
+
+def pinned_core(toon_config: Dict[str, Any]):
+    """A TOONCoreSystem over a private settings file, so neither the user's settings nor a reload affect a run"""
+    from toon_config import TOONConfigService
+    from toon_core_system import TOONCoreSystem
+
+    settings_path = Path(tempfile.mkdtemp(prefix='toon-benchmark-')) / 'settings.json'
+    settings_path.write_text(json.dumps({'toonIntegration': {'configHotReload': False, **toon_config}}))
+    return TOONCoreSystem(config_service=TOONConfigService(settings_path))
+
+def build_targets() -> Dict[str, Callable[[Any], Any]]:
+    """Benchmarked operations, each taking one payload"""
+    from toon_format import encode_toon, analyze_tokens
+
+    # Caches off so interception measures the full pipeline on every payload
+    core = pinned_core({'enabled': True, 'tokenAware': False, 'schemaCache': False, 'contextOptimization': True})
+    cache = pinned_core({'enabled': True}).toon_cache
+
+    def cache_round_trip(payload: Any) -> Any:
+        key = cache.make_key(payload)
+        if cache.get_cached_conversion(payload, key) is None:
+            cache.cache_conversion(payload, '', {'tokens_saved': 0}, key)
+        return cache.get_cached_conversion(payload, key)
+
+    return {
+        'encode_toon': encode_toon,
+        'analyze_tokens': analyze_tokens,
+        'intercept_all_data': lambda payload: core.intercept_all_data(payload, {'source': 'benchmark'}),
+        'toon_cache': cache_round_trip
+    }
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_target(target: Callable[[Any], Any], payloads: List[Any], sizes: List[int], repeat: int) -> Dict[str, Any]:
+    """Time a target over all payloads, then measure its peak allocations in a separate pass"""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for payload in payloads:
+            start = time.perf_counter()
+            target(payload)
+            latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    # tracemalloc slows everything down, so memory is measured without the timer
+    tracemalloc.start()
+    for payload in payloads:
+        target(payload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    total_bytes = sum(sizes) * repeat
+    return {
+        'payloads': len(payloads) * repeat,
+        'seconds': round(elapsed, 4),
+        'mb_per_s': round(total_bytes / elapsed / 1e6, 3) if elapsed else 0.0,
+        'payloads_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+        'peak_memory_kb': round(peak / 1024, 1)
+    }
+
+def token_savings(payloads: List[Any]) -> Dict[str, Any]:
+    """Aggregate JSON versus TOON token counts for a corpus"""
+    from toon_format import encode_toon
+    from toon_tokenizer import count_tokens
+
+    json_tokens = toon_tokens = 0
+    for payload in payloads:
+        json_tokens += count_tokens(json.dumps(payload, separators=(',', ':')))
+        toon_tokens += count_tokens(encode_toon(payload))
+
+    return {
+        'json_tokens': json_tokens,
+        'toon_tokens': toon_tokens,
+        'savings_percent': round((json_tokens - toon_tokens) / json_tokens * 100, 2) if json_tokens else 0.0
+    }
+
+def benchmark_conversion(corpora: Dict[str, List[Any]], targets: List[str] = None, repeat: int = 1) -> Dict[str, Any]:
+    """Throughput, latency, memory and token savings for every corpus and target"""
+    available = build_targets()
+    selected = targets or list(available)
+    report = {}
+
+    for corpus_name, payloads in corpora.items():
+        if not payloads:
+            continue
+        sizes = [len(json.dumps(payload, separators=(',', ':'))) for payload in payloads]
+        corpus_report = {
+            'payloads': len(payloads),
+            'bytes': sum(sizes),
+            'token_savings': token_savings(payloads),
+            'targets': {}
+        }
+        for target_name in selected:
+            corpus_report['targets'][target_name] = run_target(available[target_name], payloads, sizes, repeat)
+        report[corpus_name] = corpus_report
+
+    return report
+
+def json_documents(seed: int = 11) -> Dict[str, Any]:
+    """Small, medium and large documents for comparing toon_json with the stdlib"""
+    rng = random.Random(seed)
+
+    def rows(count: int) -> List[Dict[str, Any]]:
+        return [{'id': i, 'name': f'user_{i}', 'role': rng.choice(['admin', 'member']), 'score': rng.randint(0, 100)}
+                for i in range(count)]
+
+    return {
+        'small': {'id': 1, 'name': 'user_1', 'active': True, 'tags': ['a', 'b']},
+        'medium': {'users': rows(200)},
+        'large': {'users': rows(20000)}
+    }
+
+def benchmark_json(repeat: int = 1) -> Dict[str, Any]:
+    """Per-call cost of toon_json.dumps/loads against json.dumps/loads, cold and warm"""
+    import toon_json
+    from toon_core_system import set_toon_core_system
+
+    def timed(func, args):
+        start = time.perf_counter()
+        outputs = [func(arg) for arg in args]
+        return (time.perf_counter() - start) / len(args) * 1e6, outputs
+
+    # toon_json uses the global core; pin its config so the user's settings cannot turn TOON off
+    set_toon_core_system(pinned_core({'enabled': True}))
+    report = {}
+    try:
+        for name, document in json_documents().items():
+            # Fewer iterations for bigger documents keeps each measurement to a similar wall time
+            iterations = max(1, 20000 // max(1, len(json.dumps(document)) // 64)) * repeat
+            stdlib_text = json.dumps(document)
+            report[name] = {
+                'bytes': len(stdlib_text),
+                'iterations': iterations,
+                'toon_applied': toon_json.dumps(document) != stdlib_text
+            }
+
+            # Cold calls see a new revision every time, so the conversion cache never hits;
+            # warm calls repeat the document primed above and are served from the cache
+            passes = {
+                'cold': [{**document, 'revision': i} for i in range(iterations)],
+                'warm': [document] * iterations
+            }
+            for temperature, documents in passes.items():
+                timings = {}
+                timings['json.dumps'], stdlib_texts = timed(json.dumps, documents)
+                timings['toon_json.dumps'], toon_texts = timed(toon_json.dumps, documents)
+                timings['json.loads'], _ = timed(json.loads, stdlib_texts)
+                timings['toon_json.loads'], _ = timed(toon_json.loads, toon_texts)
+
+                report[name][temperature] = {
+                    'us_per_call': {label: round(value, 3) for label, value in timings.items()},
+                    'dumps_overhead_percent': round((timings['toon_json.dumps'] / timings['json.dumps'] - 1) * 100, 1),
+                    'loads_overhead_percent': round((timings['toon_json.loads'] / timings['json.loads'] - 1) * 100, 1)
+                }
+    finally:
+        set_toon_core_system(None)
+
+    return report
+
+def environment_info() -> Dict[str, Any]:
+    """Identify the code and interpreter a report was produced with"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=AGENTS_PATH,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat()
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='TOON benchmarks')
+    parser.add_argument('--suite', choices=['startup', 'conversion', 'json', 'all'], default='all')
+    parser.add_argument('--runs', type=int, default=10, help='fresh processes for the startup suite')
+    parser.add_argument('--corpus', default=str(DEFAULT_CORPUS_PATH), help='directory of recorded *.jsonl transcripts')
+    parser.add_argument('--limit', type=int, default=2000, help='maximum recorded payloads')
+    parser.add_argument('--repeat', type=int, default=1, help='timed passes over each corpus')
+    parser.add_argument('--target', action='append', help='restrict to a target (repeatable)')
+    parser.add_argument('--output', help='write the JSON report to a file instead of stdout')
+    args = parser.parse_args()
+
+    report = {'environment': environment_info()}
+    if args.suite in ('startup', 'all'):
+        report['startup'] = benchmark_startup(args.runs)
+    if args.suite in ('conversion', 'all'):
+        corpora = synthetic_corpora()
+        corpora['recorded'] = recorded_corpus(Path(args.corpus), args.limit)
+        report['conversion'] = benchmark_conversion(corpora, args.target, args.repeat)
+    if args.suite in ('json', 'all'):
+        report['json'] = benchmark_json(args.repeat)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
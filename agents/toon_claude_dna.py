@@ -58,6 +58,7 @@ class ClaudeToonDNA:
             'conversation_compression_threshold': 2000,
             'code_compression_threshold': 5000,
             'context_awareness': True,
+            'context_delta': False,
             'learning_integration': True,
             'nested_learning_enabled': True
         }
@@ -119,40 +120,40 @@ class ClaudeToonDNA:
             if not self.claude_config.get('optimize_conversations', True):
                 return conversation_data
             
-            processed_messages = []
+            processed_messages = list(conversation_data)
             total_saved = 0
             
-            for message in conversation_data:
-                # Optimize message content
-                if 'content' in message and len(message['content']) > self.claude_config['conversation_compression_threshold']:
-                    # Create TOON-aware message structure
-                    optimized_content, info = self.toon_core.intercept_all_data(
-                        message, {'source': 'claude_conversation', 'message_type': message.get('role', 'user')}
-                    )
+            # Long messages go through TOON as one batch instead of one call each
+            threshold = self.claude_config['conversation_compression_threshold']
+            indexes = [i for i, message in enumerate(conversation_data)
+                       if 'content' in message and len(message['content']) > threshold]
+            results = self.toon_core.intercept_many(
+                [conversation_data[i] for i in indexes],
+                [{'source': 'claude_conversation', 'message_type': conversation_data[i].get('role', 'user')}
+                 for i in indexes]
+            )
+            
+            for index, (optimized_content, info) in zip(indexes, results):
+                message = conversation_data[index]
+                if info['toon_applied']:
+                    total_saved += info.get('tokens_saved', 0)
                     
-                    if info['toon_applied']:
-                        total_saved += info.get('tokens_saved', 0)
-                        
-                        # Create optimized message
-                        optimized_message = message.copy()
-                        optimized_message['content'] = optimized_content
-                        optimized_message['toon_optimized'] = True
-                        optimized_message['token_savings'] = info.get('tokens_saved', 0)
-                        
-                        processed_messages.append(optimized_message)
-                        
-                        # Track compression
-                        self.conversation_state['toon_compressed_messages'].append({
-                            'timestamp': datetime.now().isoformat(),
-                            'message_type': message.get('role', 'unknown'),
-                            'original_size': len(message['content']),
-                            'compressed_size': info.get('compression_ratio', 0) * len(message['content']),
-                            'tokens_saved': info.get('tokens_saved', 0)
-                        })
-                    else:
-                        processed_messages.append(message)
-                else:
-                    processed_messages.append(message)
+                    # Create optimized message
+                    optimized_message = message.copy()
+                    optimized_message['content'] = optimized_content
+                    optimized_message['toon_optimized'] = True
+                    optimized_message['token_savings'] = info.get('tokens_saved', 0)
+                    
+                    processed_messages[index] = optimized_message
+                    
+                    # Track compression
+                    self.conversation_state['toon_compressed_messages'].append({
+                        'timestamp': datetime.now().isoformat(),
+                        'message_type': message.get('role', 'unknown'),
+                        'original_size': len(message['content']),
+                        'compressed_size': info.get('compression_ratio', 0) * len(message['content']),
+                        'tokens_saved': info.get('tokens_saved', 0)
+                    })
             
             # Update conversation state
             self.conversation_state['saved_tokens'] += total_saved
@@ -273,7 +274,7 @@ class ClaudeToonDNA:
             # Process large context data
             if len(json.dumps(context_data)) > 1000:
                 processed_context, info = self.toon_core.intercept_all_data(
-                    context_data, {'source': 'claude_context'}
+                    context_data, {'source': 'claude_context', 'delta': self.claude_config.get('context_delta') is True}
                 )
                 
                 if info['toon_applied']:
@@ -282,7 +283,8 @@ class ClaudeToonDNA:
                         'toon_optimization': {
                             'tokens_saved': info.get('tokens_saved', 0),
                             'original_size': len(json.dumps(context_data)),
-                            'compressed_size': len(json.dumps(processed_context))
+                            'compressed_size': len(json.dumps(processed_context)),
+                            'delta': info.get('delta')
                         }
                     }
             
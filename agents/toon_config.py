@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+TOON Config Service
+Parses Factory settings once per process and hot-reloads them on change
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS_PATH = Path(os.path.expanduser('~/.factory/settings.json'))
+
+# Used when settings.json exists but has no toonIntegration section
+DEFAULT_TOON_CONFIG = {
+    'enabled': True,
+    'coreSystem': True,
+    'autoConvert': True,
+    'minSavingsPercent': 15,
+    'optimizePrompts': True,
+    'optimizeResponses': True,
+    'optimizeConfigs': True,
+    'optimizeLogs': True,
+    'tokenAware': True,
+    'intelligentTruncation': True,
+    'contextOptimization': True,
+    'agentInterception': True,
+    'nestedLearning': True
+}
+
+# Strings are matched first so comment markers inside values are left alone
+_JSONC_PATTERN = re.compile(r'"(?:\\.|[^"\\])*"|//[^\n]*|/\*.*?\*/|,(?=\s*[}\]])', re.DOTALL)
+
+class FrozenConfig(dict):
+    """Read-only dict; still a dict so .get() stays fast and json.dumps works"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('TOON config snapshots are immutable')
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __hash__(self):
+        return id(self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+def freeze(value: Any) -> Any:
+    """Recursively convert parsed JSON into immutable containers"""
+    if isinstance(value, dict):
+        return FrozenConfig((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def strip_json_comments(text: str) -> str:
+    """Remove // and /* */ comments and trailing commas from JSON text"""
+    return _JSONC_PATTERN.sub(lambda m: m.group(0) if m.group(0)[0] == '"' else '', text)
+
+def load_settings(path: Path) -> Dict[str, Any]:
+    """Parse a settings file that may contain comments"""
+    with open(path, 'r') as f:
+        return json.loads(strip_json_comments(f.read()))
+
+class TOONConfigService:
+    """Shared, hot-reloadable view of settings.json"""
+
+    def __init__(self, settings_path: Path = DEFAULT_SETTINGS_PATH):
+        self.settings_path = Path(settings_path)
+        self.lock = threading.Lock()
+        self.observer = None
+        self.subscribers: List[Callable[[FrozenConfig], None]] = []
+        self.stamp = None
+        self.version = 0
+
+        # Readers take whichever snapshot is current; reload() swaps both at once
+        self.settings = FrozenConfig()
+        self.toon = FrozenConfig({'enabled': False})
+        self.reload()
+
+    def reload(self) -> bool:
+        """Re-parse settings if the file changed; returns True when a new snapshot was installed"""
+        with self.lock:
+            try:
+                stat = self.settings_path.stat()
+            except OSError:
+                stamp = None
+            else:
+                stamp = (stat.st_mtime_ns, stat.st_size)
+
+            # Editors emit several events per save; unchanged files are not re-parsed
+            if stamp == self.stamp and self.version:
+                return False
+
+            if stamp is None:
+                settings, toon = FrozenConfig(), FrozenConfig({'enabled': False})
+            else:
+                try:
+                    settings = freeze(load_settings(self.settings_path))
+                    toon = settings.get('toonIntegration') or freeze(DEFAULT_TOON_CONFIG)
+                except Exception as e:
+                    logger.error(f"Failed to load TOON config: {e}")
+                    # A half-written file keeps the last good snapshot
+                    self.stamp = stamp
+                    if self.version:
+                        return False
+                    settings, toon = FrozenConfig(), FrozenConfig({'enabled': False})
+
+            self.stamp = stamp
+            if self.version and settings == self.settings:
+                return False
+
+            self.settings, self.toon = settings, toon
+            self.version += 1
+            subscribers = list(self.subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(toon)
+            except Exception as e:
+                logger.warning(f"TOON config subscriber failed: {e}")
+
+        return True
+
+    def subscribe(self, callback: Callable[[FrozenConfig], None]):
+        """Call callback with the new TOON config after every reload"""
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def start_watching(self) -> bool:
+        """Watch the settings file for changes"""
+        if self.observer is not None:
+            return True
+
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            logger.warning("watchdog not installed; TOON config will not hot-reload")
+            return False
+
+        service = self
+        target = str(self.settings_path)
+
+        class SettingsEventHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # Reading the file raises open/close events of its own, so only writes count
+                if event.event_type not in ('modified', 'created', 'moved', 'closed'):
+                    return
+                # Atomic saves arrive as a move onto the settings path
+                if event.src_path == target or getattr(event, 'dest_path', None) == target:
+                    service.reload()
+
+        try:
+            self.settings_path.parent.mkdir(parents=True, exist_ok=True)
+            observer = Observer()
+            observer.daemon = True
+            observer.schedule(SettingsEventHandler(), str(self.settings_path.parent), recursive=False)
+            observer.start()
+        except Exception as e:
+            logger.warning(f"Failed to watch TOON config: {e}")
+            return False
+
+        self.observer = observer
+        return True
+
+    def stop_watching(self):
+        """Stop the file watcher"""
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+
+# Global config service
+_config_service = None
+_config_service_lock = threading.Lock()
+
+def get_config_service() -> TOONConfigService:
+    """Get or create the process-wide config service"""
+    global _config_service
+    if _config_service is None:
+        with _config_service_lock:
+            if _config_service is None:
+                _config_service = TOONConfigService()
+    return _config_service
+
+if __name__ == "__main__":
+    service = get_config_service()
+    print(json.dumps(service.toon, indent=2))
@@ -5,95 +5,227 @@ Deep integration of Token-Oriented Object Notation into Droid DNA
 """
 
 import os
-import sys
+import re
 import json
 import logging
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, Tuple, Callable, Iterable, TYPE_CHECKING
+from json.encoder import encode_basestring_ascii
 import threading
 import queue
 import time
+import math
+import hashlib
+import tempfile
+import random
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from toon_config import get_config_service
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    from toon_config import TOONConfigService
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.expanduser('~/.factory/logs/toon_core.log')),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# Settings that change what a cached decision or conversion would be
+CACHE_KEY_SETTINGS = (
+    'minSavingsPercent', 'dictionaryEncoding', 'tokenizer', 'intelligentTruncation', 'contextOptimization',
+    'analysisSampling', 'analysisSampleThreshold', 'analysisSampleSize', 'analysisCostFraction',
+    'analysisNodeBudget'
+)
+
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+_TRAILING_SPACE = re.compile(r'[ \t]+$', re.MULTILINE)
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+def configure_logging():
+    """Configure TOON logging; deferred so importing this module has no side effects"""
+    log_dir = Path(os.path.expanduser('~/.factory/logs'))
+    log_dir.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(message)s',
+        handlers=[
+            logging.FileHandler(str(log_dir / 'toon_core.log'), delay=True),
+            logging.StreamHandler()
+        ]
+    )
+
 class TOONCoreSystem:
     """Core TOON integration system embedded in Droid DNA"""
     
-    def __init__(self):
+    def __init__(self, config_service: 'TOONConfigService' = None):
+        configure_logging()
         self.factory_path = Path(os.path.expanduser('~/.factory'))
         self.claude_path = Path(os.path.expanduser('~/.claude'))
         
-        # TOON configuration
+        # TOON configuration; the shared service swaps in new snapshots on change, and
+        # a private service (e.g. over a pinned settings file) isolates this instance
+        self.config_service = config_service or get_config_service()
         self.config = self.load_toon_config()
+        self.apply_tokenizer(self.config.get('tokenizer'))
+        self.config_service.subscribe(self.apply_config)
         
         # Core components
         self.toon_interceptor = TOONInterceptor(self)
+        self.toon_analyzer = TOONAnalyzer(self)
         self.toon_optimizer = TOONOptimizer(self)
         self.toon_cache = TOONCache(self)
+        self.toon_schemas = TOONSchemaCache(self)
+        
+        from toon_delta import TOONDeltaEncoder
+        self.toon_delta = TOONDeltaEncoder(
+            max_sources=self.config.get('deltaMaxSources', 64),
+            history=self.config.get('deltaHistory', 4),
+            resync_every=self.config.get('deltaResyncEvery', 20)
+        )
         
         # Runtime state
-        self.conversion_stats = {
-            'total_conversions': 0,
-            'total_tokens_saved': 0,
-            'conversion_rate': 0.0,
-            'last_conversion': None
-        }
+        self.metrics = TOONMetrics()
+        self.toon_profiler = TOONProfiler(self)
         
-        # Start background processing
-        self.background_thread = threading.Thread(target=self.background_processor, daemon=True)
-        self.background_thread.start()
+        # Bounded queues provide backpressure to producers
+        queue_size = self.config.get('backgroundQueueSize', 256)
+        self.conversion_queue = queue.Queue(maxsize=queue_size)
+        self.optimization_queue = queue.Queue(maxsize=queue_size)
         
-        self.conversion_queue = queue.Queue()
-        self.optimization_queue = queue.Queue()
+        # The config watcher starts with the first interception; worker threads and
+        # pools start on first use, so hook processes that never queue work never pay for them
+        self.config_watch_started = False
+        self.background_threads = []
+        self.batch_executor = None
+        self.async_executor = None
+        self.executor_lock = threading.Lock()
         
         logger.info("TOON Core System initialized and embedded in Droid DNA")
     
     def load_toon_config(self) -> Dict[str, Any]:
         """Load TOON configuration from settings"""
-        settings_file = self.factory_path / 'settings.json'
-        
-        if settings_file.exists():
-            try:
-                with open(settings_file, 'r') as f:
-                    settings = json.load(f)
-                
-                return settings.get('toonIntegration', {
-                    'enabled': True,
-                    'coreSystem': True,
-                    'autoConvert': True,
-                    'minSavingsPercent': 15,
-                    'optimizePrompts': True,
-                    'optimizeResponses': True,
-                    'optimizeConfigs': True,
-                    'optimizeLogs': True,
-                    'tokenAware': True,
-                    'intelligentTruncation': True,
-                    'contextOptimization': True,
-                    'agentInterception': True,
-                    'nestedLearning': True
-                })
-            except Exception as e:
-                logger.error(f"Failed to load TOON config: {e}")
+        return self.config_service.toon
+    
+    def apply_config(self, config: Dict[str, Any]):
+        """Install a reloaded config snapshot"""
+        previous, self.config = self.config, config
+        if config.get('tokenizer') != previous.get('tokenizer'):
+            self.apply_tokenizer(config.get('tokenizer'))
+        logger.info("TOON config reloaded")
+    
+    def apply_tokenizer(self, spec: Optional[str]):
+        """Select the token counting backend (offline vocab path, 'tiktoken:<encoding>' or 'heuristic')"""
+        if not spec:
+            return
         
-        return {'enabled': False}
+        from toon_tokenizer import TokenCounter, create_tokenizer, set_token_counter
+        try:
+            set_token_counter(TokenCounter(create_tokenizer(spec)))
+        except Exception as e:
+            logger.warning(f"Failed to load TOON tokenizer {spec}: {e}")
     
     def intercept_all_data(self, data: Any, context: Dict[str, Any] = None) -> Tuple[Any, Dict[str, Any]]:
         """Intercept and process all data through TOON system"""
         context = context or {}
         
+        # Watched even while disabled, so enabling TOON in settings takes effect
+        if not self.config_watch_started:
+            self.ensure_config_watcher()
+        
         if not self.config.get('enabled', False):
             return data, {'intercepted': False, 'reason': 'TOON disabled'}
         
+        return self._intercept(data, context, self.intercept_options())
+    
+    def intercept_many(self, items: List[Any], contexts: Union[Dict[str, Any], List[Dict[str, Any]]] = None,
+                       parallel: bool = False) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Intercept a batch of payloads, returning (data, info) pairs in input order"""
+        items = list(items)
+        if contexts is None or isinstance(contexts, dict):
+            contexts = [contexts or {}] * len(items)
+        else:
+            contexts = [context or {} for context in contexts]
+            if len(contexts) != len(items):
+                raise ValueError(f"Expected {len(items)} contexts, got {len(contexts)}")
+        
+        if not self.config_watch_started:
+            self.ensure_config_watcher()
+        
+        if not self.config.get('enabled', False):
+            return [(data, {'intercepted': False, 'reason': 'TOON disabled'}) for data in items]
+        
+        # Config is read once for the whole batch
+        options = self.intercept_options()
+        workers = self.config.get('batchWorkers', 4)
+        # A batch started from a pool thread runs inline; fanning out onto the same bounded
+        # pool could leave every worker waiting on work queued behind it
+        on_pool = threading.current_thread().name.startswith('toon-batch')
+        if on_pool or not parallel or workers < 2 or len(items) < self.config.get('batchParallelThreshold', 64):
+            return [self._intercept(data, context, options) for data, context in zip(items, contexts)]
+        
+        # The first payload of each shape runs inline so its schema is learned once
+        # and shared by the rest of the batch instead of being rediscovered per worker
+        results = [None] * len(items)
+        pending = []
+        seen_shapes = set()
+        for index, data in enumerate(items):
+            fingerprint = self.toon_schemas.fingerprint(data) if options['schema_cache'] else None
+            if fingerprint is not None and fingerprint not in seen_shapes:
+                seen_shapes.add(fingerprint)
+                results[index] = self._intercept(data, contexts[index], options)
+            else:
+                pending.append(index)
+        
+        executor = self.get_batch_executor()
+        outputs = executor.map(lambda index: self._intercept(items[index], contexts[index], options), pending)
+        for index, output in zip(pending, outputs):
+            results[index] = output
+        
+        return results
+    
+    def intercept_options(self) -> Dict[str, bool]:
+        """Snapshot the config flags consulted on every interception"""
+        return {
+            'token_aware': self.config.get('tokenAware', True),
+            'schema_cache': self.config.get('schemaCache', True),
+            'context_optimization': self.config.get('contextOptimization', True),
+            'stage_timing': self.config.get('stageTiming', False)
+        }
+    
+    def get_batch_executor(self) -> 'ThreadPoolExecutor':
+        """Get or create the shared thread pool used for batch interception"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with self.executor_lock:
+            if self.batch_executor is None:
+                self.batch_executor = ThreadPoolExecutor(
+                    max_workers=self.config.get('batchWorkers', 4),
+                    thread_name_prefix='toon-batch'
+                )
+            return self.batch_executor
+    
+    def get_async_executor(self) -> 'ThreadPoolExecutor':
+        """Get or create the thread pool behind the async facade, kept apart from the batch pool"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with self.executor_lock:
+            if self.async_executor is None:
+                self.async_executor = ThreadPoolExecutor(
+                    max_workers=self.config.get('asyncWorkers', 4),
+                    thread_name_prefix='toon-async'
+                )
+            return self.async_executor
+    
+    def _intercept(self, data: Any, context: Dict[str, Any], options: Dict[str, bool]) -> Tuple[Any, Dict[str, Any]]:
+        if options['stage_timing']:
+            return self.toon_profiler.run(self._intercept_stages, data, context, options)
+        return self._intercept_stages(data, context, options)
+    
+    def _intercept_stages(self, data: Any, context: Dict[str, Any], options: Dict[str, bool]) -> Tuple[Any, Dict[str, Any]]:
+        stage = self.toon_profiler.stage
         interception_result = {
             'intercepted': True,
             'original_type': type(data).__name__,
@@ -103,41 +235,114 @@ class TOONCoreSystem:
             'optimizations_applied': []
         }
         
+        original_data = data
         try:
-            # Determine if TOON conversion is beneficial
-            should_convert, analysis = self.should_convert_to_toon(data, context)
+            # Budgeted compression runs first so the caches see the payload actually sent
+            if options['context_optimization'] and isinstance(data, (dict, list)):
+                budget = self.toon_optimizer.token_budget(context)
+                if budget:
+                    with stage('compression'):
+                        compressed, compression = self.toon_optimizer.compress_to_budget(data, budget)
+                    if compression['compressed']:
+                        data = compressed
+                        interception_result['compression'] = compression
+                        interception_result['optimizations_applied'].append('context_compression')
+                        if compression['truncated_strings']:
+                            interception_result['optimizations_applied'].append('intelligent_truncation')
+            
+            # Repeat payloads are served from the content-addressed cache
+            cache_key = None
+            cached = None
+            serialized = None
+            if options['token_aware'] and isinstance(data, (dict, list)):
+                with stage('cache'):
+                    # One serialization feeds both the cache key and the analyzer's size
+                    serialized = serialize_payload(data)
+                    cache_key = self.toon_cache.make_key(data, serialized)
+                    cached = self.toon_cache.get_cached_conversion(data, cache_key)
+            
+            schema = None
+            if cached is not None:
+                analysis = cached['analysis']
+                should_convert = cached['toon_data'] is not None
+                interception_result['cache_hit'] = True
+            else:
+                with stage('analysis'):
+                    # Payloads with a known shape reuse its decision and table headers
+                    fingerprint = None
+                    if options['schema_cache']:
+                        fingerprint = self.toon_schemas.fingerprint(data)
+                        schema = self.toon_schemas.get_schema(fingerprint)
+                    
+                    if schema is not None:
+                        should_convert = schema['convert']
+                        analysis = self.toon_schemas.schema_analysis(data, schema)
+                    else:
+                        # Determine if TOON conversion is beneficial
+                        should_convert, analysis = self.should_convert_to_toon(data, context, serialized)
+                        if fingerprint is not None:
+                            schema = self.toon_schemas.learn_schema(fingerprint, should_convert, analysis)
             interception_result['analysis'] = analysis
             
             if should_convert:
-                # Convert to TOON
-                toon_data, conversion_info = self.convert_to_toon(data, context)
+                if cached is not None:
+                    toon_data, conversion_info = cached['toon_data'], cached['conversion_info']
+                else:
+                    # Convert to TOON, reusing the analysis instead of re-serializing
+                    toon_data, conversion_info = self.convert_to_toon(data, context, analysis, cache_key, schema, serialized)
+                # Exact counts can overrule the estimate; the payload then goes out unchanged
+                should_convert = not conversion_info.get('rejected')
+                if not should_convert:
+                    interception_result['reason'] = 'savings below minSavingsPercent'
+                    interception_result['savings_percent'] = conversion_info['savings_percent']
+            
+            if should_convert:
                 interception_result['toon_applied'] = True
                 interception_result['tokens_saved'] = conversion_info['tokens_saved']
                 interception_result['compression_ratio'] = conversion_info['compression_ratio']
-                interception_result['optimizations_applied'] = conversion_info['optimizations']
+                interception_result['optimizations_applied'].extend(conversion_info['optimizations'])
                 
                 # Update statistics
-                self.update_conversion_stats(conversion_info)
+                with stage('stats'):
+                    self.update_conversion_stats(conversion_info, cached=cached is not None)
                 
                 result_data = toon_data
             else:
+                # Remember negative decisions too so repeats skip analysis (rejections cache themselves)
+                if cache_key is not None and cached is None and 'reason' not in interception_result:
+                    self.toon_cache.cache_conversion(data, None, None, cache_key, analysis)
                 result_data = data
             
             # Apply intelligent context optimization if enabled
-            if self.config.get('contextOptimization', True):
-                context_opt = self.toon_optimizer.optimize_context(result_data, context)
+            if options['context_optimization']:
+                with stage('optimize'):
+                    context_opt = self.toon_optimizer.optimize_context(result_data, context)
                 if context_opt['optimized']:
                     result_data = context_opt['data']
                     interception_result['optimizations_applied'].extend(context_opt['optimizations'])
             
+            # Successive TOON payloads can go out as a patch against the last one; strictly
+            # opt-in per call, since the consumer must hold the base and the source must be
+            # unique to that caller
+            source = context.get('source')
+            if (context.get('delta') is True and source and interception_result['toon_applied']
+                    and isinstance(data, (dict, list))):
+                with stage('delta'):
+                    result_data, delta_info = self.toon_delta.encode(source, data, result_data, context.get('delta_base'))
+                interception_result['delta'] = delta_info
+                if delta_info['mode'] == 'patch':
+                    interception_result['tokens_saved'] += delta_info['tokens_saved']
+                    interception_result['optimizations_applied'].append('delta_encoding')
+            
             return result_data, interception_result
             
         except Exception as e:
             logger.error(f"TOON interception failed: {e}")
             interception_result['error'] = str(e)
-            return data, interception_result
+            return original_data, interception_result
     
-    def should_convert_to_toon(self, data: Any, context: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+    def should_convert_to_toon(self, data: Any, context: Dict[str, Any],
+                               serialized: str = None) -> Tuple[bool, Dict[str, Any]]:
         """Determine if data should be converted to TOON format"""
         analysis = {
             'data_type': type(data).__name__,
@@ -152,25 +357,14 @@ class TOONCoreSystem:
             return False, analysis
         
         try:
-            # Calculate data size and complexity
-            data_str = json.dumps(data, separators=(',', ':'))
-            analysis['data_size'] = len(data_str)
-            
-            # Analyze structure for TOON suitability
-            structure_analysis = self.analyze_structure_for_toon(data)
+            # Size, structure and token estimates come from a single traversal
+            structure_analysis = self.toon_analyzer.analyze(data, serialized)
             analysis.update(structure_analysis)
             
             # Calculate conversion potential
-            if structure_analysis['suitability_score'] > 0.3:
-                # Perform actual conversion analysis
-                from toon_format import analyze_tokens
-                
-                token_analysis = analyze_tokens(data)
-                analysis['token_analysis'] = token_analysis
-                
-                if token_analysis['recommended'] and token_analysis['savings_percent'] >= self.config.get('minSavingsPercent', 15):
-                    analysis['recommendation'] = 'convert_to_toon'
-                    return True, analysis
+            if is_toon_conversion_recommended(structure_analysis, self.config.get('minSavingsPercent', 15)):
+                analysis['recommendation'] = 'convert_to_toon'
+                return True, analysis
             
             analysis['recommendation'] = 'no_conversion'
             return False, analysis
@@ -182,97 +376,19 @@ class TOONCoreSystem:
     
     def analyze_structure_for_toon(self, data: Any) -> Dict[str, Any]:
         """Analyze data structure for TOON suitability"""
-        analysis = {
-            'suitability_score': 0.0,
-            'structure_type': 'unknown',
-            'nesting_depth': 0,
-            'uniqueness_score': 0.0,
-            'table_suitability': 0.0,
-            'reasons': []
-        }
-        
-        def analyze_structure(data, depth=0, parent_path=''):
-            nonlocal analysis
-            
-            if depth > analysis['nesting_depth']:
-                analysis['nesting_depth'] = depth
-            
-            if isinstance(data, dict):
-                if not data:
-                    return
-                
-                # Check for table-like structure
-                if all(isinstance(v, (str, int, float, bool)) for v in data.values()):
-                    analysis['table_suitability'] += 0.3 * len(data)
-                    analysis['reasons'].append(f'Dict with {len(data)} simple values')
-                
-                # Check for mixed types
-                value_types = set(type(v).__name__ for v in data.values())
-                if len(value_types) == 1 and 'str' in value_types:
-                    analysis['uniqueness_score'] += 0.2
-                    analysis['reasons'].append('Uniform string values')
-                
-                # Recursively analyze nested structures
-                for key, value in data.items():
-                    if isinstance(value, (dict, list)):
-                        analyze_structure(value, depth + 1, f"{parent_path}.{key}")
-                
-            elif isinstance(data, list):
-                if not data:
-                    return
-                
-                # Check for array of similar objects (ideal for TOON)
-                if all(isinstance(item, dict) for item in data):
-                    if data:
-                        # Check if all dicts have similar structure
-                        first_keys = set(data[0].keys())
-                        similar_structure = all(set(item.keys()) == first_keys for item in data[1:max(1, len(data)//2)])
-                        
-                        if similar_structure:
-                            analysis['suitability_score'] += 0.5 * min(1.0, len(data) / 10)
-                            analysis['reasons'].append(f'Array of {len(data)} similar dicts')
-                            analysis['structure_type'] = 'table_like'
-                
-                # Check for simple arrays
-                if all(isinstance(item, (str, int, float, bool)) for item in data):
-                    analysis['suitability_score'] += 0.2
-                    analysis['reasons'].append(f'Array of {len(data)} simple values')
-                
-                # Recursively analyze nested structures
-                for item in data[:5]:  # Sample first 5 items
-                    if isinstance(item, (dict, list)):
-                        analyze_structure(item, depth + 1, f"{parent_path}[item]")
-        
-        analyze_structure(data)
-        
-        # Calculate overall suitability
-        if analysis['nesting_depth'] <= 2:
-            analysis['suitability_score'] += 0.3
-            analysis['reasons'].append('Shallow nesting depth')
-        
-        # Adjust score based on size
-        if analysis['data_size'] > 500:
-            analysis['suitability_score'] += 0.2
-            analysis['reasons'].append('Large data size')
-        elif analysis['data_size'] < 100:
-            analysis['suitability_score'] -= 0.1
-        
-        analysis['suitability_score'] = min(1.0, analysis['suitability_score'])
-        
-        if analysis['suitability_score'] < 0.1 and analysis['nesting_depth'] > 3:
-            analysis['structure_type'] = 'deeply_nested'
-            analysis['reasons'].append('Deep nesting reduces TOON efficiency')
-        
-        return analysis
+        return self.toon_analyzer.analyze(data)
     
-    def convert_to_toon(self, data: Any, context: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    def convert_to_toon(self, data: Any, context: Dict[str, Any], analysis: Dict[str, Any] = None,
+                        cache_key: str = None, schema: Dict[str, Any] = None,
+                        serialized: str = None) -> Tuple[Any, Dict[str, Any]]:
         """Convert data to TOON format with full analysis"""
         conversion_info = {
-            'original_size': len(json.dumps(data)),
+            'original_size': 0,
             'toon_size': 0,
             'tokens_saved': 0,
             'compression_ratio': 0.0,
             'optimizations': [],
+            'optimization_savings': {},
             'conversion_time': 0.0,
             'success': False
         }
@@ -280,32 +396,74 @@ class TOONCoreSystem:
         try:
             start_time = time.time()
             
+            # Callers that already analyzed the payload pass the result through
+            schema_hit = schema is not None and analysis is not None and analysis.get('schema_hit')
+            stage = self.toon_profiler.stage
+            if not schema_hit and (analysis is None or 'token_analysis' not in analysis):
+                with stage('analysis'):
+                    analysis = self.toon_analyzer.analyze(data)
+            
             # Convert using TOON format
-            from toon_format import encode_toon, analyze_tokens
+            from toon_format import encode_toon
+            from toon_tokenizer import count_tokens
             
-            toon_data = encode_toon(data)
+            with stage('encode'):
+                if schema is not None:
+                    toon_data = encode_toon(data, table_schemas=schema['tables'])
+                else:
+                    toon_data = encode_toon(data)
+            
+            # Count the TOON output exactly
+            with stage('tokenization'):
+                toon_tokens = count_tokens(toon_data)
             
-            # Analyze conversion
-            token_analysis = analyze_tokens(data)
+            # Optional legend of repeated values and path prefixes, kept only when it pays off
+            if self.config.get('dictionaryEncoding', False):
+                tables = schema['tables'] if schema is not None else None
+                with stage('encode'):
+                    dictionary_data = encode_toon(data, table_schemas=tables, dictionary=True)
+                if dictionary_data.startswith('@legend'):
+                    with stage('tokenization'):
+                        dictionary_tokens = count_tokens(dictionary_data)
+                    if dictionary_tokens < toon_tokens:
+                        conversion_info['optimizations'].append('dictionary_encoding')
+                        conversion_info['optimization_savings']['dictionary_encoding'] = toon_tokens - dictionary_tokens
+                        toon_data, toon_tokens = dictionary_data, dictionary_tokens
+            # Analysis estimates only drive the decision; savings are measured on this payload
+            json_text = serialized if serialized is not None else serialize_payload(data)
+            with stage('tokenization'):
+                json_tokens = count_tokens(json_text)
+            original_size = len(json_text)
+            if schema is not None and not schema_hit:
+                # Table headers are now filled in, so later payloads of this shape may use it
+                schema['encoded'] = True
+            tokens_saved = json_tokens - toon_tokens
             
             end_time = time.time()
             
+            conversion_info['original_size'] = original_size
             conversion_info['toon_size'] = len(toon_data)
-            conversion_info['tokens_saved'] = token_analysis['tokens_saved']
-            conversion_info['compression_ratio'] = token_analysis['savings_percent'] / 100
+            conversion_info['tokens_saved'] = tokens_saved
+            conversion_info['compression_ratio'] = tokens_saved / json_tokens if json_tokens else 0.0
+            conversion_info['savings_percent'] = round(conversion_info['compression_ratio'] * 100, 2)
             conversion_info['conversion_time'] = end_time - start_time
             conversion_info['success'] = True
             
-            # Add optimizations applied
-            if self.config.get('intelligentTruncation', True):
-                conversion_info['optimizations'].append('intelligent_truncation')
-            
-            if self.config.get('contextOptimization', True):
-                conversion_info['optimizations'].append('context_optimization')
+            # The analysis only estimates; exact counts decide whether TOON is worth sending
+            if not meets_savings_threshold(json_tokens, toon_tokens, self.config.get('minSavingsPercent', 15)):
+                conversion_info['rejected'] = True
+                if schema is not None:
+                    # Later payloads of this shape skip straight to JSON
+                    schema['convert'] = False
+                if self.config.get('tokenAware', True):
+                    with stage('cache'):
+                        self.toon_cache.cache_conversion(data, None, None, cache_key, analysis)
+                return data, conversion_info
             
             # Cache the conversion
             if self.config.get('tokenAware', True):
-                self.toon_cache.cache_conversion(data, toon_data, conversion_info)
+                with stage('cache'):
+                    self.toon_cache.cache_conversion(data, toon_data, conversion_info, cache_key, analysis)
             
             result_data = toon_data
             
@@ -316,41 +474,91 @@ class TOONCoreSystem:
         
         return result_data, conversion_info
     
-    def update_conversion_stats(self, conversion_info: Dict[str, Any]):
+    def update_conversion_stats(self, conversion_info: Dict[str, Any], cached: bool = False):
         """Update conversion statistics"""
-        self.conversion_stats['total_conversions'] += 1
-        self.conversion_stats['tokens_saved'] += conversion_info.get('tokens_saved', 0)
-        self.conversion_stats['last_conversion'] = datetime.now().isoformat()
+        self.metrics.record_conversion(conversion_info, cached)
+    
+    @property
+    def conversion_stats(self) -> Dict[str, Any]:
+        """Aggregated conversion statistics"""
+        return self.metrics.snapshot()
+    
+    def ensure_config_watcher(self):
+        """Start watching settings.json for changes (watchdog is imported only here)"""
+        self.config_watch_started = True
+        if self.config.get('configHotReload', True):
+            self.config_service.start_watching()
+    
+    def ensure_background_workers(self):
+        """Start background workers and the config watcher on first use"""
+        if self.background_threads:
+            return
+        
+        self.ensure_config_watcher()
+        with self.executor_lock:
+            if not self.background_threads:
+                self.start_background_workers(self.config.get('backgroundWorkers', 2))
+    
+    def start_background_workers(self, worker_count: int):
+        """Start worker threads that block on the background queues"""
+        for index in range(max(1, worker_count)):
+            worker = threading.Thread(
+                target=self.background_processor,
+                args=(self.conversion_queue, self.process_background_conversion),
+                name=f'toon-conversion-{index}',
+                daemon=True
+            )
+            worker.start()
+            self.background_threads.append(worker)
         
-        if self.conversion_stats['total_conversions'] > 0:
-            avg_savings = self.conversion_stats['tokens_saved'] / self.conversion_stats['total_conversions']
-            self.conversion_stats['conversion_rate'] = avg_savings
+        # Maintenance tasks touch shared files, so they run on a single worker
+        worker = threading.Thread(
+            target=self.background_processor,
+            args=(self.optimization_queue, self.process_background_optimization),
+            name='toon-optimization',
+            daemon=True
+        )
+        worker.start()
+        self.background_threads.append(worker)
     
-    def background_processor(self):
-        """Background processing for TOON operations"""
+    def background_processor(self, task_queue: queue.Queue, handler: Callable[[Dict[str, Any]], None]):
+        """Process tasks from a queue as soon as they arrive"""
         while True:
+            task = task_queue.get()
             try:
-                # Process conversion queue
-                if not self.conversion_queue.empty():
-                    for _ in range(min(5, self.conversion_queue.qsize())):
-                        task = self.conversion_queue.get_nowait()
-                        self.process_background_conversion(task)
-                
-                # Process optimization queue
-                if not self.optimization_queue.empty():
-                    for _ in range(min(3, self.optimization_queue.qsize())):
-                        task = self.optimization_queue.get_nowait()
-                        self.process_background_optimization(task)
-                
-                # Periodic maintenance
-                time.sleep(10)
-                
+                if task is None:
+                    return
+                handler(task)
             except Exception as e:
                 logger.error(f"Background processing error: {e}")
-                time.sleep(30)
+            finally:
+                task_queue.task_done()
+    
+    def shutdown_background_workers(self, wait: bool = True):
+        """Stop background workers after they drain queued tasks"""
+        if self.background_threads:
+            conversion_workers = [t for t in self.background_threads if t.name.startswith('toon-conversion')]
+            for _ in conversion_workers:
+                self.conversion_queue.put(None)
+            self.optimization_queue.put(None)
+            
+            if wait:
+                for worker in self.background_threads:
+                    worker.join()
+            self.background_threads = []
+        
+        with self.executor_lock:
+            for executor in (self.batch_executor, self.async_executor):
+                if executor is not None:
+                    executor.shutdown(wait=wait)
+            self.batch_executor = self.async_executor = None
     
     def process_background_conversion(self, task: Dict[str, Any]):
         """Process background conversion task"""
+        future = task.get('future')
+        if future is not None and not future.set_running_or_notify_cancel():
+            return
+        
         try:
             data = task['data']
             context = task.get('context', {})
@@ -358,12 +566,17 @@ class TOONCoreSystem:
             # Perform conversion
             result_data, result_info = self.intercept_all_data(data, context)
             
+            if future is not None:
+                future.set_result((result_data, result_info))
+            
             # Store result if a callback is provided
-            if 'callback' in task:
+            if task.get('callback'):
                 task['callback'](result_data, result_info)
                 
         except Exception as e:
             logger.error(f"Background conversion task failed: {e}")
+            if future is not None and not future.done():
+                future.set_exception(e)
     
     def process_background_optimization(self, task: Dict[str, Any]):
         """Process background optimization task"""
@@ -380,24 +593,130 @@ class TOONCoreSystem:
         except Exception as e:
             logger.error(f"Background optimization task failed: {e}")
     
-    def scan_and_optimize_files(self, directory: str):
-        """Scan directory and optimize eligible files"""
+    def scan_and_optimize_files(self, directory: str) -> Dict[str, Any]:
+        """Incrementally scan directory and optimize changed eligible files"""
         if not directory:
             directory = str(self.factory_path)
         
-        dir_path = Path(directory)
+        dir_path = Path(directory).resolve()
+        summary = {
+            'directory': str(dir_path),
+            'files': 0,
+            'skipped': 0,
+            'processed': 0,
+            'converted': 0,
+            'failed': 0,
+            'elapsed': 0.0
+        }
         
         if not dir_path.exists():
-            return
+            return summary
         
-        # Find JSON files eligible for TOON conversion
-        json_files = list(dir_path.rglob('*.json'))
+        start_time = time.time()
+        index_path = self.factory_path / 'cache' / 'toon' / 'scan_index.json'
+        index = self.load_scan_index(index_path)
         
-        for json_file in json_files:
+        # Only files whose size or mtime changed since the last scan are re-read
+        pending = []
+        seen = set()
+        for json_file in self.iter_scan_candidates(dir_path):
             try:
-                self.optimize_file_if_beneficial(json_file)
+                stat = json_file.stat()
+            except OSError:
+                continue
+            
+            key = str(json_file)
+            seen.add(key)
+            entry = index.get(key)
+            
+            if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+                summary['skipped'] += 1
+                continue
+            
+            pending.append((key, entry.get('digest') if entry and 'error' not in entry else None))
+        
+        summary['files'] = len(seen)
+        min_savings = self.config.get('minSavingsPercent', 15)
+        
+        for result in self.run_scan_workers(pending, min_savings):
+            key = result.pop('path')
+            previous = index.get(key, {})
+            
+            if result.get('unchanged'):
+                # Content is identical (e.g. touched file), keep the previous outcome
+                result.pop('unchanged')
+                summary['skipped'] += 1
+                index[key] = {**previous, **result}
+                continue
+            
+            summary['processed'] += 1
+            if 'error' in result:
+                summary['failed'] += 1
+                logger.warning(f"Failed to optimize {key}: {result['error']}")
+            elif result.get('converted'):
+                summary['converted'] += 1
+                logger.info(f"Optimized {key} -> {result['toon_path']} (saved {result['tokens_saved']} tokens)")
+            
+            result['scanned_at'] = datetime.now().isoformat()
+            index[key] = result
+        
+        # Forget files under this directory that no longer exist
+        prefix = str(dir_path) + os.sep
+        for key in [k for k in index if k.startswith(prefix) and k not in seen]:
+            del index[key]
+        
+        try:
+            write_text_atomic(index_path, json.dumps(index, separators=(',', ':')))
+        except OSError as e:
+            logger.error(f"Failed to save TOON scan index: {e}")
+        
+        summary['elapsed'] = time.time() - start_time
+        logger.info(f"TOON file scan of {dir_path}: {summary['processed']} processed, "
+                    f"{summary['skipped']} unchanged, {summary['converted']} converted in {summary['elapsed']:.2f}s")
+        return summary
+    
+    def iter_scan_candidates(self, dir_path: Path):
+        """Yield JSON files eligible for TOON conversion"""
+        cache_dir = str(self.factory_path / 'cache')
+        excluded_names = {'settings.json', 'auth.json'}
+        
+        for root, dirs, files in os.walk(dir_path):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != cache_dir]
+            for name in files:
+                if name.endswith('.json') and name not in excluded_names and '.toon' not in name:
+                    yield Path(root) / name
+    
+    def load_scan_index(self, index_path: Path) -> Dict[str, Any]:
+        """Load the path -> (size, mtime, digest, result) scan index"""
+        try:
+            with open(index_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable TOON scan index: {e}")
+            return {}
+    
+    def run_scan_workers(self, pending: List[Tuple[str, Optional[str]]], min_savings: float) -> List[Dict[str, Any]]:
+        """Convert pending files across a process pool, in-process for small batches"""
+        if not pending:
+            return []
+        
+        paths = [path for path, _ in pending]
+        digests = [digest for _, digest in pending]
+        savings = [min_savings] * len(pending)
+        worker_count = self.config.get('scanWorkers') or os.cpu_count() or 1
+        
+        if len(pending) >= self.config.get('scanParallelThreshold', 16) and worker_count > 1:
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=worker_count) as executor:
+                    chunksize = max(1, len(pending) // (worker_count * 4))
+                    return list(executor.map(scan_file_for_toon, paths, digests, savings, chunksize=chunksize))
             except Exception as e:
-                logger.warning(f"Failed to optimize {json_file}: {e}")
+                logger.warning(f"TOON scan pool unavailable, scanning serially: {e}")
+        
+        return [scan_file_for_toon(*args) for args in zip(paths, digests, savings)]
     
     def optimize_file_if_beneficial(self, file_path: Path):
         """Optimize file if TOON conversion is beneficial"""
@@ -416,14 +735,15 @@ class TOONCoreSystem:
             
             if should_convert:
                 # Convert and save TOON version
-                toon_data, conversion_info = self.convert_to_toon(data, context)
+                toon_data, conversion_info = self.convert_to_toon(data, context, analysis)
+                if conversion_info.get('rejected') or not conversion_info['success']:
+                    return
                 
                 # Save optimized file
                 toon_path = file_path.with_suffix('.toon')
                 toon_path.parent.mkdir(parents=True, exist_ok=True)
                 
-                with open(toon_path, 'w') as f:
-                    f.write(toon_data)
+                write_text_atomic(toon_path, toon_data)
                 
                 logger.info(f"Optimized {file_path} -> {toon_path} (saved {conversion_info['tokens_saved']} tokens)")
         
@@ -445,8 +765,11 @@ class TOONCoreSystem:
     def get_system_statistics(self) -> Dict[str, Any]:
         """Get comprehensive system statistics"""
         return {
-            'conversion_stats': self.conversion_stats,
+            'conversion_stats': self.metrics.snapshot(),
             'cache_stats': self.toon_cache.get_statistics(),
+            'schema_stats': self.toon_schemas.get_statistics(),
+            'delta_stats': self.toon_delta.get_statistics(),
+            'stage_timings': self.metrics.stage_snapshot(),
             'config': self.config,
             'system_timestamp': datetime.now().isoformat(),
             'active_conversions': self.conversion_queue.qsize()
@@ -502,19 +825,28 @@ class TOONCoreSystem:
             logger.error(f"Response interception failed: {e}")
             return response
     
-    def queue_background_conversion(self, data: Any, context: Dict[str, Any], callback=None):
-        """Queue data for background TOON conversion"""
+    def queue_background_conversion(self, data: Any, context: Dict[str, Any], callback=None,
+                                    block: bool = False, timeout: float = None) -> Future:
+        """Queue data for background TOON conversion, returning a Future of (data, info)"""
+        future = Future()
         task = {
             'data': data,
             'context': context,
             'callback': callback,
+            'future': future,
             'timestamp': datetime.now().isoformat()
         }
         
+        self.ensure_background_workers()
+        
+        # Blocking producers wait for queue space; others fail fast with queue.Full
         try:
-            self.conversion_queue.put_nowait(task)
-        except queue.Full:
+            self.conversion_queue.put(task, block=block, timeout=timeout)
+        except queue.Full as e:
             logger.warning("TOON conversion queue full, dropping task")
+            future.set_exception(e)
+        
+        return future
     
     def queue_background_optimization(self, optimization_type: str, **kwargs):
         """Queue background optimization task"""
@@ -524,11 +856,289 @@ class TOONCoreSystem:
             **kwargs
         }
         
+        self.ensure_background_workers()
+        
         try:
             self.optimization_queue.put_nowait(task)
         except queue.Full:
             logger.warning("TOON optimization queue full, dropping task")
 
+class TOONMetrics:
+    """Conversion counters and histograms sharded per thread and aggregated on read"""
+    
+    # Upper bounds of the histogram buckets; the last bucket is open-ended
+    LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+    RATIO_BUCKETS = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+    
+    COUNTERS = ('total_conversions', 'failed_conversions', 'total_tokens_saved',
+                'total_original_size', 'total_toon_size', 'cache_hits', 'cache_hit_tokens_saved')
+    
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = []
+        self.lock = threading.Lock()
+    
+    def _shard(self) -> Dict[str, Any]:
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = {
+                'counters': dict.fromkeys(self.COUNTERS, 0),
+                'latency_ms': [0] * (len(self.LATENCY_BUCKETS_MS) + 1),
+                'latency_sum_ms': 0.0,
+                'compression_ratio': [0] * (len(self.RATIO_BUCKETS) + 1),
+                'last_conversion': None,
+                'stages': {}
+            }
+            self.local.shard = shard
+            # Registration is the only locked step; updates touch the owning thread's shard only
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+    
+    def record_conversion(self, conversion_info: Dict[str, Any], cached: bool = False):
+        """Record one conversion in the calling thread's shard; cached ones count only as hits"""
+        shard = self._shard()
+        counters = shard['counters']
+        
+        if cached:
+            counters['cache_hits'] += 1
+            counters['cache_hit_tokens_saved'] += conversion_info.get('tokens_saved', 0)
+            return
+        
+        if not conversion_info.get('success', False):
+            counters['failed_conversions'] += 1
+            return
+        
+        counters['total_conversions'] += 1
+        counters['total_tokens_saved'] += conversion_info.get('tokens_saved', 0)
+        counters['total_original_size'] += conversion_info.get('original_size', 0)
+        counters['total_toon_size'] += conversion_info.get('toon_size', 0)
+        
+        latency_ms = conversion_info.get('conversion_time', 0.0) * 1000
+        shard['latency_ms'][bisect_left(self.LATENCY_BUCKETS_MS, latency_ms)] += 1
+        shard['latency_sum_ms'] += latency_ms
+        shard['compression_ratio'][bisect_left(self.RATIO_BUCKETS, conversion_info.get('compression_ratio', 0.0))] += 1
+        shard['last_conversion'] = time.time()
+    
+    def record_stage(self, stage: str, seconds: float):
+        """Record the duration of one interception stage in the calling thread's shard"""
+        stages = self._shard()['stages']
+        timing = stages.get(stage)
+        if timing is None:
+            # Bucket counts followed by the running sum and maximum in milliseconds
+            timing = stages[stage] = [0] * (len(self.LATENCY_BUCKETS_MS) + 1) + [0.0, 0.0]
+        elapsed_ms = seconds * 1000
+        timing[bisect_left(self.LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        timing[-2] += elapsed_ms
+        if elapsed_ms > timing[-1]:
+            timing[-1] = elapsed_ms
+    
+    def stage_snapshot(self) -> Dict[str, Any]:
+        """Aggregate per-stage timings from all shards"""
+        with self.lock:
+            shards = list(self.shards)
+        
+        width = len(self.LATENCY_BUCKETS_MS) + 1
+        merged = {}
+        for shard in shards:
+            for stage, timing in list(shard['stages'].items()):
+                timing = list(timing)
+                total = merged.setdefault(stage, [0] * width + [0.0, 0.0])
+                for index in range(width):
+                    total[index] += timing[index]
+                total[-2] += timing[-2]
+                total[-1] = max(total[-1], timing[-1])
+        
+        snapshot = {}
+        for stage, timing in sorted(merged.items()):
+            histogram = self._histogram(timing[:width], self.LATENCY_BUCKETS_MS)
+            histogram['total_ms'] = round(timing[-2], 3)
+            histogram['mean_ms'] = timing[-2] / histogram['count'] if histogram['count'] else 0.0
+            histogram['max_ms'] = round(timing[-1], 3)
+            snapshot[stage] = histogram
+        return snapshot
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Aggregate all shards into a point-in-time view"""
+        with self.lock:
+            shards = list(self.shards)
+        
+        counters = dict.fromkeys(self.COUNTERS, 0)
+        latency = [0] * (len(self.LATENCY_BUCKETS_MS) + 1)
+        ratios = [0] * (len(self.RATIO_BUCKETS) + 1)
+        latency_sum = 0.0
+        last_conversion = None
+        
+        for shard in shards:
+            for name, value in list(shard['counters'].items()):
+                counters[name] += value
+            for index, count in enumerate(list(shard['latency_ms'])):
+                latency[index] += count
+            for index, count in enumerate(list(shard['compression_ratio'])):
+                ratios[index] += count
+            latency_sum += shard['latency_sum_ms']
+            if shard['last_conversion'] is not None:
+                last_conversion = max(last_conversion or 0.0, shard['last_conversion'])
+        
+        conversions = counters['total_conversions']
+        snapshot = dict(counters)
+        snapshot['conversion_rate'] = counters['total_tokens_saved'] / conversions if conversions else 0.0
+        snapshot['last_conversion'] = datetime.fromtimestamp(last_conversion).isoformat() if last_conversion else None
+        snapshot['threads'] = len(shards)
+        snapshot['latency_ms'] = self._histogram(latency, self.LATENCY_BUCKETS_MS)
+        snapshot['latency_ms']['mean'] = latency_sum / sum(latency) if sum(latency) else 0.0
+        snapshot['compression_ratio'] = self._histogram(ratios, self.RATIO_BUCKETS)
+        return snapshot
+    
+    @staticmethod
+    def _histogram(counts: List[int], bounds: tuple) -> Dict[str, Any]:
+        total = sum(counts)
+        labels = [f'<={bound}' for bound in bounds] + [f'>{bounds[-1]}']
+        histogram = {
+            'count': total,
+            'buckets': dict(zip(labels, counts))
+        }
+        
+        # Percentiles resolve to the upper bound of the bucket that contains them
+        for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            value = None
+            if total:
+                rank = math.ceil(total * fraction)
+                seen = 0
+                for index, count in enumerate(counts):
+                    seen += count
+                    if seen >= rank:
+                        value = bounds[index] if index < len(bounds) else float('inf')
+                        break
+            histogram[name] = value
+        
+        return histogram
+
+class _StageTimer:
+    """Times one stage of a profiled interception"""
+    
+    __slots__ = ('profiler', 'stage', 'start')
+    
+    def __init__(self, profiler: 'TOONProfiler', stage: str):
+        self.profiler = profiler
+        self.stage = stage
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.stage, self.start, time.perf_counter())
+        return False
+
+class _NullTimer:
+    """Stand-in used when the current call is not being timed"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class TOONProfiler:
+    """Opt-in per-stage timing of interceptions with sampled cProfile or Chrome trace dumps"""
+    
+    def __init__(self, core_system):
+        self.core = core_system
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.dumps = 0
+    
+    @property
+    def profile_dir(self) -> Path:
+        return Path(os.path.expanduser(self.core.config.get('profileDir') or
+                                       str(self.core.factory_path / 'logs' / 'toon_profiles')))
+    
+    def stage(self, stage: str):
+        """Context manager timing a stage; free when the current call is not being timed"""
+        if not getattr(self.local, 'active', False):
+            return _NULL_TIMER
+        return _StageTimer(self, stage)
+    
+    def record(self, stage: str, start: float, end: float):
+        # Stages entered more than once in a call (cache lookup and store, both token counts)
+        # add up, so metrics get one entry per stage per call
+        totals = self.local.totals
+        totals[stage] = totals.get(stage, 0.0) + (end - start)
+        events = getattr(self.local, 'events', None)
+        if events is not None:
+            events.append({
+                'name': stage,
+                'cat': 'toon',
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident()
+            })
+    
+    def run(self, func: Callable[..., Any], *args) -> Any:
+        """Call func with stage timing on, profiling it if this call is sampled"""
+        # Nested calls (e.g. prompt interception re-entering) are timed by the outer call
+        if getattr(self.local, 'active', False):
+            return func(*args)
+        
+        config = self.core.config
+        sampled = random.random() < config.get('profileSampleRate', 0.0) and \
+            self.dumps < config.get('profileMaxDumps', 100)
+        profile_format = config.get('profileFormat', 'pstats')
+        
+        profile = None
+        if sampled and profile_format == 'chrome':
+            self.local.events = []
+        elif sampled:
+            import cProfile
+            profile = cProfile.Profile()
+        
+        self.local.active = True
+        self.local.totals = {}
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                return profile.runcall(func, *args)
+            return func(*args)
+        finally:
+            self.local.active = False
+            self.record('total', start, time.perf_counter())
+            for stage, seconds in self.local.totals.items():
+                self.core.metrics.record_stage(stage, seconds)
+            events, self.local.events = getattr(self.local, 'events', None), None
+            if sampled:
+                self.dump(profile, events)
+    
+    def dump(self, profile, events: Optional[List[Dict[str, Any]]]):
+        """Write one sampled call as a .prof file or append it to the process's Chrome trace"""
+        with self.lock:
+            self.dumps += 1
+            sequence = self.dumps
+        
+        try:
+            profile_dir = self.profile_dir
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            if profile is not None:
+                profile.dump_stats(str(profile_dir / f'intercept_{os.getpid()}_{int(time.time() * 1000)}_{sequence}.prof'))
+                return
+            
+            # The trace viewer accepts an unterminated JSON array, so events are appended as they come
+            trace_path = profile_dir / f'intercept_{os.getpid()}.trace.json'
+            lines = ''.join(json.dumps(event) + ',\n' for event in events)
+            with self.lock:
+                with open(trace_path, 'a') as f:
+                    if f.tell() == 0:
+                        f.write('[\n')
+                    f.write(lines)
+        except Exception as e:
+            logger.warning(f"Failed to write TOON profile: {e}")
+
 class TOONInterceptor:
     """Handles TOON interception for all data flows"""
     
@@ -589,6 +1199,335 @@ class TOONInterceptor:
         
         return False
 
+class TOONAnalyzer:
+    """Single-pass structural analysis feeding TOON conversion decisions"""
+    
+    # Chance of spotting a 5% share of heterogeneous rows drives sampled confidence
+    HETEROGENEITY_RATE = 0.05
+    
+    # Rough compact-JSON characters per node, for sizing the node budget from a serialization
+    CHARS_PER_NODE = 8
+    
+    def __init__(self, core_system, indent: int = 2):
+        self.core = core_system
+        self.indent = indent
+    
+    def sampling_plan(self, serialized: Optional[str]) -> Dict[str, Any]:
+        """Sampling settings from the live config, plus the node budget for one traversal"""
+        # Containers wider than the threshold are sampled, visiting at most
+        # max(sample_size, cost_fraction * width) children; the node budget caps the whole
+        # walk at cost_fraction of the payload's nodes, so many medium containers cannot add up
+        config = self.core.config if self.core is not None else {}
+        plan = {
+            'sampling': config.get('analysisSampling', True),
+            'threshold': config.get('analysisSampleThreshold', 1000),
+            'size': config.get('analysisSampleSize', 64),
+            'fraction': config.get('analysisCostFraction', 0.05),
+            'nodes_left': None
+        }
+        if plan['sampling']:
+            if serialized is not None:
+                estimated_nodes = len(serialized) // self.CHARS_PER_NODE
+                plan['nodes_left'] = max(plan['threshold'], int(estimated_nodes * plan['fraction']))
+            else:
+                plan['nodes_left'] = config.get('analysisNodeBudget', 50000)
+        return plan
+    
+    def analyze(self, data: Any, serialized: str = None) -> Dict[str, Any]:
+        """Measure size, depth, table-likeness and token estimates in one traversal"""
+        from toon_format import estimate_tokens_for_size
+        
+        state = {
+            'plan': self.sampling_plan(serialized),
+            'sampled': False,
+            'confidence': 1.0,
+            'visited_nodes': 0,
+            'max_depth': 0,
+            'tables': 0,
+            'largest_table': 0,
+            'table_rows': 0,
+            'array_items': 0,
+            'object_items': 0,
+            'uniform_object_items': 0,
+            'simple_arrays': 0,
+            'simple_dicts': 0,
+            'uniform_string_dicts': 0
+        }
+        
+        json_size, toon_size, _ = self._walk(data, 0, state)
+        if serialized is not None:
+            # A compact serialization made for the cache key gives the exact size for free
+            json_size = len(serialized)
+        
+        analysis = {
+            'data_size': json_size,
+            'estimated_toon_size': toon_size,
+            'sampled': state['sampled'],
+            'confidence': round(state['confidence'], 3),
+            'visited_nodes': state['visited_nodes'],
+            'suitability_score': 0.0,
+            'structure_type': 'unknown',
+            'nesting_depth': state['max_depth'],
+            'uniqueness_score': min(1.0, 0.2 * state['uniform_string_dicts']),
+            'table_suitability': state['table_rows'] / state['array_items'] if state['array_items'] else 0.0,
+            'key_uniformity': state['uniform_object_items'] / state['object_items'] if state['object_items'] else 0.0,
+            'reasons': []
+        }
+        
+        score = 0.0
+        if state['tables']:
+            score += 0.5 * min(1.0, state['largest_table'] / 10)
+            analysis['structure_type'] = 'table_like'
+            analysis['reasons'].append(f"{state['tables']} uniform arrays ({state['table_rows']} rows)")
+        
+        if state['simple_arrays']:
+            score += 0.2
+            analysis['reasons'].append(f"{state['simple_arrays']} arrays of simple values")
+        
+        if state['simple_dicts']:
+            analysis['reasons'].append(f"{state['simple_dicts']} dicts with simple values")
+        
+        if state['max_depth'] <= 2:
+            score += 0.3
+            analysis['reasons'].append('Shallow nesting depth')
+        
+        if json_size > 500:
+            score += 0.2
+            analysis['reasons'].append('Large data size')
+        elif json_size < 100:
+            score -= 0.1
+        
+        analysis['suitability_score'] = max(0.0, min(1.0, score))
+        
+        if analysis['suitability_score'] < 0.1 and state['max_depth'] > 3:
+            analysis['structure_type'] = 'deeply_nested'
+            analysis['reasons'].append('Deep nesting reduces TOON efficiency')
+        
+        json_tokens = estimate_tokens_for_size(json_size)
+        toon_tokens = estimate_tokens_for_size(toon_size)
+        tokens_saved = json_tokens - toon_tokens
+        
+        analysis['token_analysis'] = {
+            'json_size': json_size,
+            'toon_size': toon_size,
+            'json_tokens': json_tokens,
+            'toon_tokens': toon_tokens,
+            'tokens_saved': tokens_saved,
+            'savings_percent': round(tokens_saved / json_tokens * 100, 2) if json_tokens else 0.0,
+            'recommended': tokens_saved > 0,
+            'estimated': True
+        }
+        
+        return analysis
+    
+    def _walk(self, node: Any, depth: int, state: Dict[str, Any]) -> Tuple[int, int, int]:
+        """Return (compact JSON length, TOON length, tabular row length or -1) for a node"""
+        state['visited_nodes'] += 1
+        plan = state['plan']
+        if plan['nodes_left'] is not None:
+            plan['nodes_left'] -= 1
+        if isinstance(node, str):
+            json_len = len(encode_basestring_ascii(node))
+            return json_len, json_len - 2, json_len - 2
+        if node is None or node is True:
+            return 4, 4, 4
+        if node is False:
+            return 5, 5, 5
+        if isinstance(node, (int, float)):
+            scalar_len = len(repr(node))
+            return scalar_len, scalar_len, scalar_len
+        
+        if depth > state['max_depth']:
+            state['max_depth'] = depth
+        
+        if isinstance(node, dict):
+            return self._walk_dict(node, depth, state)
+        if isinstance(node, list):
+            return self._walk_list(node, depth, state)
+        
+        # Unknown objects are serialized via str() by default handlers
+        scalar_len = len(str(node)) + 2
+        return scalar_len, scalar_len, scalar_len
+    
+    def _sample_budget(self, width: int, plan: Dict[str, Any]) -> int:
+        """Number of children to visit in a container of the given width"""
+        if not plan['sampling'] or width <= plan['threshold']:
+            return width
+        return min(width, max(plan['size'], int(width * plan['fraction'])))
+    
+    def _walk_child(self, node: Any, depth: int, state: Dict[str, Any], siblings_left: int) -> Tuple[int, int, int]:
+        # A nested container may spend only its share of the nodes left, so later siblings
+        # are sampled as well as earlier ones
+        plan = state['plan']
+        left = plan['nodes_left']
+        if left is None or not isinstance(node, (dict, list)):
+            return self._walk(node, depth, state)
+        share = left // siblings_left
+        plan['nodes_left'] = share
+        try:
+            return self._walk(node, depth, state)
+        finally:
+            plan['nodes_left'] = left - (share - plan['nodes_left'])
+    
+    @staticmethod
+    def _exhausted(plan: Dict[str, Any], visited: int) -> bool:
+        # Every container sees at least one child, so its estimate can still be extrapolated
+        return visited > 0 and plan['nodes_left'] is not None and plan['nodes_left'] <= 0
+    
+    def _record_sample(self, visited: int, width: int, state: Dict[str, Any]):
+        if visited < width:
+            state['sampled'] = True
+            state['confidence'] = min(state['confidence'], 1 - (1 - self.HETEROGENEITY_RATE) ** visited)
+    
+    def _walk_dict(self, node: Dict[str, Any], depth: int, state: Dict[str, Any]) -> Tuple[int, int, int]:
+        pad = self.indent * depth
+        width = len(node)
+        plan = state['plan']
+        budget = self._sample_budget(width, plan)
+        json_len = 0
+        toon_len = 0
+        row_len = 0
+        simple = True
+        all_strings = bool(node)
+        
+        # Wide dicts are measured on a deterministic random sample of keys
+        if budget < width:
+            keys = list(node)
+            items = ((keys[i], node[keys[i]]) for i in random.Random(width).sample(range(width), budget))
+        else:
+            items = node.items()
+        
+        # Narrow dicts are rows or records; cutting one short would skew every row estimate
+        stoppable = width > plan['size']
+        visited = 0
+        for key, value in items:
+            if stoppable and self._exhausted(plan, visited):
+                break
+            visited += 1
+            key_json = len(encode_basestring_ascii(str(key)))
+            child_json, child_toon, child_row = self._walk_child(value, depth + 1, state, budget - visited + 1)
+            json_len += key_json + 1 + child_json
+            
+            if isinstance(value, dict):
+                toon_len += pad + key_json - 2 + 2 + child_toon
+                simple = all_strings = False
+            elif isinstance(value, list):
+                toon_len += pad + key_json - 2 + child_toon
+                simple = all_strings = False
+            else:
+                toon_len += pad + key_json - 2 + 3 + child_toon
+                row_len += child_row
+                if not isinstance(value, str):
+                    all_strings = False
+        
+        if visited < width:
+            scale = width / visited
+            json_len = int(json_len * scale)
+            toon_len = int(toon_len * scale)
+            row_len = int(row_len * scale)
+            self._record_sample(visited, width, state)
+        
+        json_len += 2 + max(0, width - 1)
+        row_len += max(0, width - 1)
+        
+        if node and simple:
+            state['simple_dicts'] += 1
+        if all_strings:
+            state['uniform_string_dicts'] += 1
+        
+        return json_len, toon_len, (row_len if simple else -1)
+    
+    def _walk_list(self, node: List[Any], depth: int, state: Dict[str, Any]) -> Tuple[int, int, int]:
+        count = len(node)
+        header = len(str(count)) + 3
+        json_len = 2 + max(0, count - 1)
+        state['array_items'] += count
+        
+        if not count:
+            return json_len, header + 1, -1
+        
+        item_pad = self.indent * (depth + 1)
+        items_json = 0
+        scalar_total = 0
+        row_total = 0
+        listed_total = 0
+        all_primitive = True
+        tabular = True
+        first_keys = None
+        uniform_items = 0
+        object_items = 0
+        
+        # Large arrays are measured on a deterministic random sample of rows
+        plan = state['plan']
+        budget = self._sample_budget(count, plan)
+        if budget < count:
+            # Unsorted so an early exit still leaves a uniform sample
+            indices = random.Random(count).sample(range(count), budget)
+            items = (node[i] for i in indices)
+        else:
+            items = node
+        
+        visited = 0
+        for item in items:
+            # Once rows are known to be heterogeneous more samples cannot change the layout
+            if budget < count and visited >= plan['size'] and not tabular and not all_primitive:
+                break
+            if self._exhausted(plan, visited):
+                break
+            visited += 1
+            
+            child_json, child_toon, child_row = self._walk_child(item, depth + 1, state, budget - visited + 1)
+            items_json += child_json
+            
+            if isinstance(item, dict):
+                all_primitive = False
+                object_items += 1
+                if first_keys is None:
+                    first_keys = item.keys()
+                if item.keys() == first_keys:
+                    uniform_items += 1
+                    if child_row < 0:
+                        tabular = False
+                    else:
+                        row_total += item_pad + child_row + 1
+                else:
+                    tabular = False
+                listed_total += child_toon + 1
+            elif isinstance(item, list):
+                all_primitive = tabular = False
+                listed_total += item_pad + 2 + child_toon
+            else:
+                tabular = False
+                scalar_total += child_toon
+                listed_total += item_pad + 2 + child_toon + 1
+        
+        if visited < count:
+            scale = count / visited
+            items_json = int(items_json * scale)
+            scalar_total = int(scalar_total * scale)
+            row_total = int(row_total * scale)
+            listed_total = int(listed_total * scale)
+            object_items = int(object_items * scale)
+            uniform_items = int(uniform_items * scale)
+            self._record_sample(visited, count, state)
+        
+        json_len += items_json
+        state['object_items'] += object_items
+        state['uniform_object_items'] += uniform_items
+        
+        if all_primitive:
+            state['simple_arrays'] += 1
+            return json_len, header + 2 + scalar_total + count - 1 + 1, -1
+        
+        if tabular and first_keys:
+            state['tables'] += 1
+            state['table_rows'] += count
+            state['largest_table'] = max(state['largest_table'], count)
+            fields = sum(len(str(key)) for key in first_keys) + len(first_keys) + 1
+            return json_len, header + fields + 2 + row_total, -1
+        
+        return json_len, header + 2 + listed_total, -1
+
 class TOONOptimizer:
     """Handles intelligent optimization of TOON-processed data"""
     
@@ -608,10 +1547,10 @@ class TOONOptimizer:
             'optimizations': []
         }
         
-        # Apply context-specific optimizations
+        # Apply context-specific optimizations; strategies return None when they change nothing
         for strategy_name, strategy_func in self.optimization_strategies.items():
             try:
-                optimized_data = strategy_func(data, context)
+                optimized_data = strategy_func(result['data'], context)
                 if optimized_data is not None:
                     result['data'] = optimized_data
                     result['optimized'] = True
@@ -621,97 +1560,859 @@ class TOONOptimizer:
         
         return result
     
+    def token_budget(self, context: Dict[str, Any]) -> Optional[int]:
+        """Token budget for this payload, from the context (None there means unbudgeted) or the config"""
+        if 'token_budget' in context:
+            return context['token_budget']
+        return self.core.config.get('contextTokenBudget')
+    
+    def compress_to_budget(self, data: Any, budget: Optional[int]) -> Tuple[Any, Dict[str, Any]]:
+        """Fit structured data into a token budget, dropping the least valuable content first"""
+        compressor = TOONBudgetCompressor(
+            priority_keys=self.core.config.get('contextPriorityKeys', ()),
+            low_value_keys=self.core.config.get('contextLowValueKeys', ())
+        )
+        return compressor.compress(data, budget)
+    
     def optimize_context_compression(self, data: Any, context: Dict[str, Any]) -> Any:
-        """Apply intelligent context compression"""
-        if isinstance(data, str) and len(data) > 1000:
-            # Intelligent truncation for long strings
-            return data[:800] + '...' if len(data) > 900 else data
+        """Trim text that still exceeds the token budget, keeping its head and tail"""
+        budget = self.token_budget(context)
+        if not budget or not isinstance(data, str):
+            return None
         
-        return data
+        from toon_tokenizer import get_token_counter
+        counter = get_token_counter()
+        total = counter.count(data)
+        if total <= budget:
+            return None
+        
+        marker = f'\n... [{total - budget} tokens omitted] ...\n'
+        available = budget - counter.count(marker)
+        if available <= 0:
+            return counter.truncate(data, budget)
+        head = counter.truncate(data, available * 2 // 3)
+        tail = counter.truncate(data[len(head):], available - counter.count(head), from_end=True)
+        return head + marker + tail
     
     def optimize_cache_access(self, data: Any, context: Dict[str, Any]) -> Any:
-        """Optimize for cache access patterns"""
-        # This would implement cache-aware optimizations
-        return data
+        """Replace repeated long strings with references to their first occurrence"""
+        if not self.core.config.get('dedupeStrings', False) or not isinstance(data, (dict, list)):
+            return None
+        
+        deduped, info = self.compress_to_budget(data, None)
+        return deduped if info['deduplicated'] else None
     
     def optimize_memory_usage(self, data: Any, context: Dict[str, Any]) -> Any:
-        """Optimize for memory efficiency"""
-        # This would implement memory-efficient representations
-        return data
+        """Strip trailing whitespace and collapse runs of blank lines in text"""
+        if not self.core.config.get('normalizeWhitespace', False) or not isinstance(data, str):
+            return None
+        
+        normalized = _BLANK_LINES.sub('\n\n', _TRAILING_SPACE.sub('', data))
+        return normalized if len(normalized) < len(data) else None
+
+class TOONBudgetCompressor:
+    """Single-pass, budgeted compression of structured data by field and row importance"""
+    
+    PRIORITY_KEYS = frozenset({
+        'id', 'name', 'title', 'path', 'file', 'status', 'type', 'error', 'errors',
+        'message', 'summary', 'result', 'description', 'content', 'text'
+    })
+    LOW_VALUE_KEYS = frozenset({
+        'metadata', 'meta', 'debug', 'raw', 'trace', 'stack', 'stacktrace', 'headers',
+        'extra', 'links', 'etag', 'checksum', 'hash', 'signature'
+    })
+    
+    # Smallest allowance worth spending on a partially kept subtree
+    MIN_PARTIAL_TOKENS = 8
+    # Held back in every container that has to drop content, for its omission note
+    OMISSION_RESERVE = 16
+    # Strings at least this long are replaced by a reference when repeated
+    DEDUPE_MIN_CHARS = 48
+    
+    def __init__(self, priority_keys: Iterable[str] = (), low_value_keys: Iterable[str] = ()):
+        from toon_tokenizer import get_token_counter
+        self.counter = get_token_counter()
+        self.priority_keys = self.PRIORITY_KEYS | set(priority_keys)
+        self.low_value_keys = self.LOW_VALUE_KEYS | set(low_value_keys)
+        self.costs: Dict[int, int] = {}
+        self.first_paths: Dict[str, str] = {}
+        self.stats = {
+            'compressed': False,
+            'deduplicated': 0,
+            'truncated_strings': 0,
+            'omitted_fields': 0,
+            'omitted_items': 0
+        }
+    
+    def compress(self, data: Any, budget: Optional[int]) -> Tuple[Any, Dict[str, Any]]:
+        """Return data that fits budget tokens (None only deduplicates) and what was removed"""
+        original_tokens = self.measure(data)
+        self.stats['original_tokens'] = original_tokens
+        self.stats['budget'] = budget
+        
+        if budget is not None and original_tokens <= budget:
+            self.stats['tokens'] = original_tokens
+            return data, self.stats
+        
+        limit = budget if budget is not None else original_tokens
+        compressed, tokens = self.fit(data, limit, '$', None)
+        if compressed is None or (data and not compressed):
+            # Nothing useful fits; a marker of the same type keeps the payload's shape
+            compressed = self.stub(data)
+            if compressed is None:
+                self.stats['tokens'] = original_tokens
+                return data, self.stats
+            tokens = self.measure(compressed)
+        
+        self.stats['tokens'] = tokens
+        self.stats['compressed'] = budget is not None
+        return compressed, self.stats
+    
+    def stub(self, data: Any) -> Any:
+        """Smallest stand-in of data's type that says what was dropped, or None for other types"""
+        if not isinstance(data, (dict, list)):
+            return None
+        # Nothing from the partial attempts survives
+        self.stats.update(deduplicated=0, truncated_strings=0, omitted_fields=0, omitted_items=0)
+        if isinstance(data, dict):
+            self.stats['omitted_fields'] = len(data)
+            return {'_omitted': f'{len(data)} fields omitted'}
+        self.stats['omitted_items'] = len(data)
+        return [f'... {len(data)} of {len(data)} items omitted ...']
+    
+    def measure(self, node: Any) -> int:
+        """Upper bound on the tokens of node as compact JSON; containers and strings are memoized"""
+        if isinstance(node, dict):
+            cost = 2 + sum(self.key_cost(key) + self.measure(value) for key, value in node.items())
+        elif isinstance(node, list):
+            cost = 2 + sum(1 + self.measure(item) for item in node)
+        elif isinstance(node, str):
+            cost = self.counter.count(json.dumps(node, ensure_ascii=False))
+        else:
+            return self.counter.count(json.dumps(node, default=str))
+        
+        self.costs[id(node)] = cost
+        return cost
+    
+    def cost(self, node: Any) -> int:
+        cost = self.costs.get(id(node))
+        return cost if cost is not None else self.measure(node)
+    
+    def key_cost(self, key: Any) -> int:
+        # Quoted key plus colon and separator
+        return self.counter.count(json.dumps(str(key), ensure_ascii=False)) + 2
+    
+    def importance(self, key: Any) -> int:
+        key = str(key).lower()
+        if key in self.priority_keys:
+            return 2
+        if key in self.low_value_keys or key.startswith('_'):
+            return 0
+        return 1
+    
+    def fit(self, node: Any, budget: int, path: str, notes: Optional[List[str]]) -> Tuple[Any, int]:
+        """Rebuild node within budget tokens; returns (None, 0) when nothing useful fits"""
+        if isinstance(node, dict):
+            return self.fit_dict(node, budget, path)
+        if isinstance(node, list):
+            return self.fit_list(node, budget, path, notes)
+        if isinstance(node, str):
+            return self.fit_string(node, budget, path)
+        
+        cost = self.cost(node)
+        return (node, cost) if cost <= budget else (None, 0)
+    
+    def fit_string(self, value: str, budget: int, path: str) -> Tuple[Any, int]:
+        if len(value) >= self.DEDUPE_MIN_CHARS:
+            first_path = self.first_paths.get(value)
+            if first_path is not None:
+                reference = f'<same as {first_path}>'
+                cost = self.counter.count(json.dumps(reference))
+                if cost <= budget:
+                    self.stats['deduplicated'] += 1
+                    return reference, cost
+        
+        cost = self.cost(value)
+        if cost <= budget:
+            if len(value) >= self.DEDUPE_MIN_CHARS:
+                self.first_paths[value] = path
+            return value, cost
+        
+        if budget < self.MIN_PARTIAL_TOKENS:
+            return None, 0
+        
+        # JSON escaping and merges at the cut can push the result past budget, so
+        # shrink the prefix by the overshoot until the encoded string fits
+        allowance = budget - self.counter.count(f'... [+{len(value)} chars]') - 2
+        while allowance > 0:
+            prefix = self.counter.truncate(value, allowance)
+            truncated = f'{prefix}... [+{len(value) - len(prefix)} chars]'
+            cost = self.counter.count(json.dumps(truncated, ensure_ascii=False))
+            if cost <= budget:
+                self.stats['truncated_strings'] += 1
+                return truncated, cost
+            allowance -= cost - budget
+        return None, 0
+    
+    def fit_dict(self, node: Dict[str, Any], budget: int, path: str) -> Tuple[Any, int]:
+        if budget < 2:
+            return None, 0
+        
+        # Valuable, cheap fields are placed first; the omission note keeps a reserve
+        reserve = self.OMISSION_RESERVE if self.cost(node) > budget else 0
+        spent = 2
+        kept = {}
+        omitted = []
+        notes: List[str] = []
+        
+        for key in sorted(node, key=lambda k: (-self.importance(k), self.cost(node[k]))):
+            overhead = self.key_cost(key)
+            available = budget - reserve - spent - overhead
+            value = node[key]
+            
+            if self.cost(value) <= available or (available >= self.MIN_PARTIAL_TOKENS and
+                                                 isinstance(value, (dict, list, str))):
+                fitted, cost = self.fit(value, available, f'{path}.{key}', notes)
+                if fitted is not None:
+                    kept[key] = fitted
+                    spent += overhead + cost
+                    continue
+            omitted.append(str(key))
+        
+        result = {key: kept[key] for key in node if key in kept}
+        if omitted or notes:
+            self.stats['omitted_fields'] += len(omitted)
+            if omitted:
+                notes.append(f"{len(omitted)} fields omitted: {', '.join(omitted)}")
+            note, cost = self.fit_string('; '.join(notes), budget - spent - self.key_cost('_omitted'), path)
+            if note is not None:
+                result['_omitted'] = note
+                spent += self.key_cost('_omitted') + cost
+        
+        return result, spent
+    
+    def fit_list(self, items: List[Any], budget: int, path: str, notes: Optional[List[str]]) -> Tuple[Any, int]:
+        if budget < 2:
+            return None, 0
+        
+        reserve = self.OMISSION_RESERVE if self.cost(items) > budget else 0
+        spent = 2
+        kept = {}
+        
+        # Keep the first and last items, then as many leading items as fit
+        order = [0, len(items) - 1] + list(range(1, len(items) - 1)) if len(items) > 1 else list(range(len(items)))
+        for index in order:
+            available = budget - reserve - spent - 1
+            item = items[index]
+            if self.cost(item) > available and (kept or available < self.MIN_PARTIAL_TOKENS):
+                break
+            fitted, cost = self.fit(item, available, f'{path}[{index}]', None)
+            if fitted is None:
+                break
+            kept[index] = fitted
+            spent += 1 + cost
+        
+        omitted = len(items) - len(kept)
+        if items and not kept:
+            return None, 0
+        if not omitted:
+            return [kept[index] for index in range(len(items))], spent
+        
+        self.stats['omitted_items'] += omitted
+        note = f'{omitted} of {len(items)} items omitted'
+        result = [kept[index] for index in sorted(kept)]
+        
+        # Rows of a table report through the parent so the table stays uniform
+        if notes is not None and all(isinstance(item, dict) for item in result):
+            notes.append(f"{path.rsplit('.', 1)[-1]}: {note}")
+            return result, spent
+        
+        marker, cost = self.fit_string(f'... {note} ...', budget - spent - 1, path)
+        if marker is not None:
+            # The gap sits between the leading items and the kept last item
+            cut = len(result) - 1 if len(items) - 1 in kept else len(result)
+            result.insert(cut, marker)
+            spent += 1 + cost
+        return result, spent
 
 class TOONCache:
-    """Intelligent caching system for TOON conversions"""
+    """Content-addressed LRU cache for TOON conversions"""
     
     def __init__(self, core_system):
         self.core = core_system
-        self.conversion_cache = {}
+        config = core_system.config
+        self.conversion_cache = OrderedDict()
+        self.fingerprint_for = None
+        self.ttl_seconds = config.get('cacheTTLSeconds', 3600)
+        self.max_bytes = config.get('cacheMaxBytes', 64 * 1024 * 1024)
+        self.lock = threading.Lock()
+        
+        # Optional on-disk tier shared by every process importing this module
+        self.persistent = None
+        if config.get('persistentCache', False):
+            self.persistent = TOONPersistentCache(
+                core_system.factory_path / 'cache' / 'toon' / 'conversions.db',
+                max_bytes=config.get('persistentCacheMaxBytes', 256 * 1024 * 1024),
+                ttl_seconds=config.get('persistentCacheTTLSeconds', 7 * 24 * 3600)
+            )
+        
         self.cache_stats = {
             'hits': 0,
+            'persistent_hits': 0,
             'misses': 0,
             'size': 0,
-            'max_size': 1000
+            'max_size': config.get('cacheMaxEntries', 1000),
+            'bytes': 0,
+            'evictions': 0,
+            'expirations': 0
         }
     
-    def cache_conversion(self, original_data: Any, toon_data: Any, conversion_info: Dict[str, Any]):
-        """Cache a successful conversion"""
-        # Generate cache key from original data
-        cache_key = str(hash(json.dumps(original_data, sort_keys=True)))
+    def make_key(self, original_data: Any, serialized: str = None) -> str:
+        """Digest of a payload plus the config it is converted under"""
+        if serialized is None:
+            serialized = serialize_payload(original_data)
+        digest = hashlib.blake2b(self.config_fingerprint().encode('utf-8'), digest_size=16)
+        digest.update(b'\0')
+        digest.update(serialized.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def config_fingerprint(self) -> str:
+        """Digest of the settings, tokenizer and encoder version that shape a cached result"""
+        config = self.core.config
+        cached = self.fingerprint_for
+        # Reloads install a new config snapshot, so identity tells when to recompute
+        if cached is not None and cached[0] is config:
+            return cached[1]
         
-        # Check cache size limits
-        if len(self.conversion_cache) >= self.cache_stats['max_size']:
-            # Remove oldest entries
-            oldest_keys = list(self.conversion_cache.keys())[:100]
-            for key in oldest_keys:
-                del self.conversion_cache[key]
+        from toon_format import TOON_FORMAT_VERSION
+        from toon_tokenizer import get_token_counter
         
-        # Store cached conversion
-        self.conversion_cache[cache_key] = {
+        settings = {name: config.get(name) for name in CACHE_KEY_SETTINGS}
+        settings['tokenizer_backend'] = get_token_counter().tokenizer.name
+        settings['format_version'] = TOON_FORMAT_VERSION
+        fingerprint = hashlib.blake2b(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'),
+                                      digest_size=8).hexdigest()
+        self.fingerprint_for = (config, fingerprint)
+        return fingerprint
+    
+    def cache_conversion(self, original_data: Any, toon_data: Any, conversion_info: Dict[str, Any],
+                         cache_key: str = None, analysis: Dict[str, Any] = None, from_disk: bool = False):
+        """Cache a conversion result (toon_data is None for payloads not worth converting)"""
+        cache_key = cache_key or self.make_key(original_data)
+        entry_bytes = len(toon_data) if isinstance(toon_data, str) else 0
+        entry_bytes += len(cache_key)
+        
+        entry = {
             'toon_data': toon_data,
             'conversion_info': conversion_info,
-            'timestamp': datetime.now().isoformat()
+            'analysis': analysis,
+            'bytes': entry_bytes,
+            'created': time.monotonic(),
+            'from_disk': from_disk
         }
         
-        self.cache_stats['size'] = len(self.conversion_cache)
+        with self.lock:
+            previous = self.conversion_cache.pop(cache_key, None)
+            if previous is not None:
+                self.cache_stats['bytes'] -= previous['bytes']
+            
+            self.conversion_cache[cache_key] = entry
+            self.cache_stats['bytes'] += entry_bytes
+            
+            # Evict least recently used entries until within both bounds
+            while self.conversion_cache and (
+                len(self.conversion_cache) > self.cache_stats['max_size']
+                or self.cache_stats['bytes'] > self.max_bytes
+            ):
+                _, evicted = self.conversion_cache.popitem(last=False)
+                self.cache_stats['bytes'] -= evicted['bytes']
+                self.cache_stats['evictions'] += 1
+            
+            self.cache_stats['size'] = len(self.conversion_cache)
+        
+        if self.persistent is not None and not entry.get('from_disk'):
+            self.persistent.put(cache_key, toon_data, conversion_info, analysis, self.config_fingerprint())
     
-    def get_cached_conversion(self, original_data: Any) -> Optional[Dict[str, Any]]:
-        """Get cached conversion if available"""
-        cache_key = str(hash(json.dumps(original_data, sort_keys=True)))
+    def get_cached_conversion(self, original_data: Any, cache_key: str = None) -> Optional[Dict[str, Any]]:
+        """Get cached conversion if available, expiring stale entries on access"""
+        cache_key = cache_key or self.make_key(original_data)
+        
+        with self.lock:
+            entry = self.conversion_cache.get(cache_key)
+            
+            if entry is not None and time.monotonic() - entry['created'] > self.ttl_seconds:
+                del self.conversion_cache[cache_key]
+                self.cache_stats['bytes'] -= entry['bytes']
+                self.cache_stats['expirations'] += 1
+                self.cache_stats['size'] = len(self.conversion_cache)
+                entry = None
+            
+            if entry is not None:
+                self.conversion_cache.move_to_end(cache_key)
+                self.cache_stats['hits'] += 1
+                return entry
         
-        if cache_key in self.conversion_cache:
-            self.cache_stats['hits'] += 1
-            return self.conversion_cache[cache_key]
+        # Fall back to the shared on-disk tier and promote hits into memory
+        if self.persistent is not None:
+            stored = self.persistent.get(cache_key, self.config_fingerprint())
+            if stored is not None:
+                self.cache_conversion(original_data, stored['toon_data'], stored['conversion_info'],
+                                      cache_key, stored['analysis'], from_disk=True)
+                with self.lock:
+                    self.cache_stats['persistent_hits'] += 1
+                return stored
         
-        self.cache_stats['misses'] += 1
+        with self.lock:
+            self.cache_stats['misses'] += 1
         return None
     
     def cleanup(self):
-        """Clean up expired cache entries"""
-        current_time = datetime.now()
+        """Drop expired entries from the cold end of the LRU order"""
+        now = time.monotonic()
+        removed = 0
         
-        expired_keys = []
-        for key, value in self.conversion_cache.items():
-            try:
-                timestamp = datetime.fromisoformat(value['timestamp'])
-                if (current_time - timestamp).total_seconds() > 3600:  # 1 hour
-                    expired_keys.append(key)
-            except Exception:
-                expired_keys.append(key)
+        with self.lock:
+            # Stop at the first live entry; anything hotter expires lazily on access
+            while self.conversion_cache:
+                key, entry = next(iter(self.conversion_cache.items()))
+                if now - entry['created'] <= self.ttl_seconds:
+                    break
+                del self.conversion_cache[key]
+                self.cache_stats['bytes'] -= entry['bytes']
+                removed += 1
+            
+            self.cache_stats['expirations'] += removed
+            self.cache_stats['size'] = len(self.conversion_cache)
         
-        for key in expired_keys:
-            del self.conversion_cache[key]
+        logger.info(f"Cache cleanup: removed {removed} expired entries")
         
-        self.cache_stats['size'] = len(self.conversion_cache)
-        logger.info(f"Cache cleanup: removed {len(expired_keys)} expired entries")
+        if self.persistent is not None:
+            self.persistent.compact()
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        total_requests = self.cache_stats['hits'] + self.cache_stats['misses']
-        hit_rate = self.cache_stats['hits'] / total_requests if total_requests > 0 else 0.0
+        with self.lock:
+            stats = dict(self.cache_stats)
         
-        return {
-            **self.cache_stats,
+        total_hits = stats['hits'] + stats['persistent_hits']
+        total_requests = total_hits + stats['misses']
+        hit_rate = total_hits / total_requests if total_requests > 0 else 0.0
+        
+        result = {
+            **stats,
             'hit_rate': hit_rate
         }
+        
+        if self.persistent is not None:
+            result['persistent'] = self.persistent.get_statistics()
+        
+        return result
+
+class TOONSchemaCache:
+    """Learned decisions and table headers for recurring payload shapes"""
+    
+    # Rows checked for uniformity per array (head, tail and an even stride between), so a
+    # lookup stays cheaper than the analysis it replaces; the encoder still validates every row
+    FINGERPRINT_SAMPLE_ROWS = 32
+    
+    def __init__(self, core_system):
+        self.core = core_system
+        config = core_system.config
+        self.max_entries = config.get('schemaCacheMaxEntries', 256)
+        self.max_width = config.get('schemaCacheMaxWidth', 64)
+        self.max_depth = config.get('schemaCacheMaxDepth', 4)
+        self.schemas = OrderedDict()
+        self.config_fingerprint = None
+        self.lock = threading.Lock()
+        self.schema_stats = {
+            'hits': 0,
+            'misses': 0,
+            'learned': 0
+        }
+    
+    def fingerprint(self, data: Any) -> Optional[tuple]:
+        """Cheap key-set fingerprint of a payload, or None if it is too wide or deep"""
+        try:
+            return self._shape(data, 0)
+        except _UnshapedPayload:
+            return None
+    
+    def _shape(self, node: Any, depth: int) -> Any:
+        if isinstance(node, dict):
+            if len(node) > self.max_width or depth > self.max_depth:
+                raise _UnshapedPayload()
+            return ('d',) + tuple((key, self._shape(value, depth + 1)) for key, value in node.items())
+        
+        if isinstance(node, list):
+            if depth > self.max_depth:
+                raise _UnshapedPayload()
+            # Uniform arrays are identified by their first element and a coarse length bucket;
+            # mixed ones encode (and save) differently from their first row, so they get no schema
+            if node and not self._uniform(node):
+                raise _UnshapedPayload()
+            first = self._shape(node[0], depth + 1) if node else None
+            return ('l', len(node).bit_length(), first)
+        
+        return type(node).__name__
+    
+    @classmethod
+    def _uniform(cls, items: List[Any]) -> bool:
+        # Sampled rows must share the first row's type, key set and, for flat rows, all-scalar values
+        count = len(items)
+        if count > cls.FINGERPRINT_SAMPLE_ROWS:
+            edge = cls.FINGERPRINT_SAMPLE_ROWS // 4
+            stride = max(1, (count - 2 * edge) // (cls.FINGERPRINT_SAMPLE_ROWS - 2 * edge))
+            items = items[:edge] + items[edge:count - edge:stride] + items[count - edge:]
+        
+        first = items[0]
+        kind = type(first)
+        if kind is not dict:
+            return all(type(item) is kind for item in items)
+        
+        keys = first.keys()
+        flat = all(type(value) in _SCALAR_TYPES for value in first.values())
+        for item in items:
+            if type(item) is not dict or item.keys() != keys:
+                return False
+            if flat and not all(type(value) in _SCALAR_TYPES for value in item.values()):
+                return False
+        return True
+    
+    def check_config(self):
+        """Forget learned decisions once the settings they were made under change"""
+        fingerprint = self.core.toon_cache.config_fingerprint()
+        if fingerprint != self.config_fingerprint:
+            with self.lock:
+                self.schemas.clear()
+                self.config_fingerprint = fingerprint
+    
+    def get_schema(self, fingerprint: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        """Look up a learned schema"""
+        if fingerprint is None:
+            return None
+        
+        self.check_config()
+        with self.lock:
+            schema = self.schemas.get(fingerprint)
+            if schema is None or (schema['convert'] and not schema.get('encoded')):
+                self.schema_stats['misses'] += 1
+                return None
+            
+            self.schemas.move_to_end(fingerprint)
+            self.schema_stats['hits'] += 1
+            return schema
+    
+    def learn_schema(self, fingerprint: tuple, convert: bool, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the decision for a shape; table headers are filled in during encoding"""
+        schema = {
+            'convert': convert,
+            'tables': {},
+            'structure_type': analysis.get('structure_type', 'unknown'),
+            'suitability_score': analysis.get('suitability_score', 0.0)
+        }
+        
+        with self.lock:
+            self.schemas[fingerprint] = schema
+            self.schemas.move_to_end(fingerprint)
+            while len(self.schemas) > self.max_entries:
+                self.schemas.popitem(last=False)
+            self.schema_stats['learned'] += 1
+        
+        return schema
+    
+    def schema_analysis(self, data: Any, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Analysis summary for a payload decided by its schema"""
+        return {
+            'data_type': type(data).__name__,
+            'schema_hit': True,
+            'structure_type': schema['structure_type'],
+            'suitability_score': schema['suitability_score'],
+            'recommendation': 'convert_to_toon' if schema['convert'] else 'no_conversion'
+        }
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get schema cache statistics"""
+        with self.lock:
+            stats = dict(self.schema_stats)
+            stats['entries'] = len(self.schemas)
+        
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+class _UnshapedPayload(Exception):
+    """Raised when a payload is too wide or deep to fingerprint cheaply"""
+
+class TOONPersistentCache:
+    """SQLite-backed conversion store shared across daemons and hook processes"""
+    
+    # Only rewrite last_access when it is older than this, to keep reads cheap
+    ACCESS_RESOLUTION_SECONDS = 60
+    # Check the size bound after this many writes
+    COMPACT_EVERY_WRITES = 64
+    # Bumped when the table layout changes; older databases are rebuilt
+    SCHEMA_VERSION = 2
+    # Rows from another config or encoder version expire once idle this long; processes
+    # still running that config keep theirs alive by reading them
+    STALE_CONFIG_SECONDS = 24 * 3600
+    
+    def __init__(self, db_path: Path, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 3600):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.writes_since_compact = 0
+        self.connection = None
+        self.fingerprint = None
+        
+        import sqlite3
+        from toon_format import TOON_FORMAT_VERSION
+        self.format_version = TOON_FORMAT_VERSION
+        
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(str(self.db_path), timeout=5.0, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            if self.connection.execute('PRAGMA user_version').fetchone()[0] < self.SCHEMA_VERSION:
+                self.connection.execute('DROP TABLE IF EXISTS conversions')
+                self.connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS conversions ('
+                'key TEXT PRIMARY KEY, toon_data TEXT, conversion_info TEXT, analysis TEXT, '
+                'bytes INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL, '
+                'config_fingerprint TEXT NOT NULL, format_version INTEGER NOT NULL)'
+            )
+            self.connection.execute('CREATE INDEX IF NOT EXISTS idx_conversions_access ON conversions(last_access)')
+            self.connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent TOON cache unavailable at {self.db_path}: {e}")
+            self.connection = None
+    
+    def get(self, cache_key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Fetch a stored conversion by content digest, if it was made under the given config"""
+        import sqlite3
+        
+        if self.connection is None:
+            return None
+        
+        now = time.time()
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    'SELECT toon_data, conversion_info, analysis, created, last_access, config_fingerprint, '
+                    'format_version FROM conversions WHERE key = ?',
+                    (cache_key,)
+                ).fetchone()
+                
+                if row is None:
+                    return None
+                
+                toon_data, conversion_info, analysis, created, last_access, row_fingerprint, row_version = row
+                
+                # Rows are scoped by config and encoder; other processes may still use a mismatch
+                if row_fingerprint != fingerprint or row_version != self.format_version:
+                    return None
+                
+                if now - created > self.ttl_seconds:
+                    self.connection.execute('DELETE FROM conversions WHERE key = ?', (cache_key,))
+                    self.connection.commit()
+                    return None
+                
+                if now - last_access > self.ACCESS_RESOLUTION_SECONDS:
+                    self.connection.execute('UPDATE conversions SET last_access = ? WHERE key = ?', (now, cache_key))
+                    self.connection.commit()
+            
+            return {
+                'toon_data': toon_data,
+                'conversion_info': json.loads(conversion_info) if conversion_info else None,
+                'analysis': json.loads(analysis) if analysis else None
+            }
+            
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Persistent TOON cache read failed: {e}")
+            return None
+    
+    def put(self, cache_key: str, toon_data: Any, conversion_info: Dict[str, Any], analysis: Dict[str, Any],
+            fingerprint: str):
+        """Store a conversion, compacting once the write budget is reached"""
+        import sqlite3
+        
+        if self.connection is None:
+            return
+        
+        self.fingerprint = fingerprint
+        now = time.time()
+        try:
+            conversion_json = json.dumps(conversion_info, default=str) if conversion_info is not None else None
+            analysis_json = json.dumps(analysis, default=str) if analysis is not None else None
+            entry_bytes = len(toon_data or '') + len(conversion_json or '') + len(analysis_json or '')
+            
+            with self.lock:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (cache_key, toon_data, conversion_json, analysis_json, entry_bytes, now, now,
+                     fingerprint, self.format_version)
+                )
+                self.connection.commit()
+                self.writes_since_compact += 1
+                should_compact = self.writes_since_compact >= self.COMPACT_EVERY_WRITES
+            
+            if should_compact:
+                self.compact(vacuum=False)
+                
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Persistent TOON cache write failed: {e}")
+    
+    def compact(self, vacuum: bool = True):
+        """Expire stale rows, enforce the size bound and reclaim file space"""
+        import sqlite3
+        
+        if self.connection is None:
+            return
+        
+        try:
+            with self.lock:
+                self.writes_since_compact = 0
+                now = time.time()
+                self.connection.execute('DELETE FROM conversions WHERE created < ?', (now - self.ttl_seconds,))
+                if self.fingerprint is not None:
+                    self.connection.execute(
+                        'DELETE FROM conversions WHERE (config_fingerprint != ? OR format_version != ?) '
+                        'AND last_access < ?',
+                        (self.fingerprint, self.format_version, now - self.STALE_CONFIG_SECONDS)
+                    )
+                
+                total_bytes = self.connection.execute('SELECT COALESCE(SUM(bytes), 0) FROM conversions').fetchone()[0]
+                if total_bytes > self.max_bytes:
+                    # Trim least recently used rows down to 90% of the bound
+                    excess = total_bytes - int(self.max_bytes * 0.9)
+                    cursor = self.connection.execute('SELECT key, bytes FROM conversions ORDER BY last_access')
+                    stale_keys = []
+                    for key, entry_bytes in cursor:
+                        stale_keys.append((key,))
+                        excess -= entry_bytes
+                        if excess <= 0:
+                            break
+                    self.connection.executemany('DELETE FROM conversions WHERE key = ?', stale_keys)
+                
+                self.connection.commit()
+                
+                if vacuum:
+                    self.connection.execute('PRAGMA incremental_vacuum')
+                    self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent TOON cache compaction failed: {e}")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get persistent tier statistics"""
+        import sqlite3
+        
+        if self.connection is None:
+            return {'available': False}
+        
+        try:
+            with self.lock:
+                entries, total_bytes = self.connection.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM conversions'
+                ).fetchone()
+            
+            return {
+                'available': True,
+                'path': str(self.db_path),
+                'entries': entries,
+                'bytes': total_bytes,
+                'max_bytes': self.max_bytes
+            }
+        except sqlite3.Error as e:
+            return {'available': False, 'error': str(e)}
+
+def serialize_payload(data: Any) -> str:
+    """Compact JSON used for cache keys and exact size measurements"""
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+def is_toon_conversion_recommended(analysis: Dict[str, Any], min_savings_percent: float) -> bool:
+    """Decide from a TOONAnalyzer result whether conversion pays off"""
+    if analysis['suitability_score'] <= 0.3:
+        return False
+    
+    token_analysis = analysis['token_analysis']
+    return token_analysis['recommended'] and token_analysis['savings_percent'] >= min_savings_percent
+
+def meets_savings_threshold(json_tokens: int, toon_tokens: int, min_savings_percent: float) -> bool:
+    """Decide from exact token counts whether a finished TOON encoding is worth sending"""
+    tokens_saved = json_tokens - toon_tokens
+    return tokens_saved > 0 and tokens_saved * 100 >= min_savings_percent * json_tokens
+
+@contextmanager
+def open_atomic(path: Path):
+    """Open a temporary sibling for writing and rename it over path on success"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_text_atomic(path: Path, text: str):
+    """Write text so readers never see a partially written file"""
+    with open_atomic(path) as f:
+        f.write(text)
+
+def scan_file_for_toon(path: str, previous_digest: Optional[str], min_savings_percent: float) -> Dict[str, Any]:
+    """Analyze one JSON file and write its .toon sibling if beneficial (process pool worker)"""
+    result = {'path': path, 'converted': False}
+    
+    try:
+        file_path = Path(path)
+        stat = file_path.stat()
+        raw = file_path.read_bytes()
+        result['size'] = stat.st_size
+        result['mtime_ns'] = stat.st_mtime_ns
+        result['digest'] = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        
+        if previous_digest is not None and result['digest'] == previous_digest:
+            result['unchanged'] = True
+            del result['converted']
+            return result
+        
+        data = json.loads(raw)
+        if not isinstance(data, (dict, list)):
+            return result
+        
+        analysis = TOONAnalyzer(None).analyze(data)
+        if not is_toon_conversion_recommended(analysis, min_savings_percent):
+            return result
+        
+        from toon_format import encode_toon
+        from toon_tokenizer import count_tokens
+        
+        # The estimate picks candidates; the file is written only if the exact counts agree
+        toon_text = encode_toon(data)
+        json_tokens = count_tokens(raw.decode('utf-8'))
+        toon_tokens = count_tokens(toon_text)
+        result['tokens_saved'] = json_tokens - toon_tokens
+        if not meets_savings_threshold(json_tokens, toon_tokens, min_savings_percent):
+            return result
+        
+        toon_path = file_path.with_suffix('.toon')
+        write_text_atomic(toon_path, toon_text)
+        result['converted'] = True
+        result['toon_path'] = str(toon_path)
+        
+    except Exception as e:
+        result['error'] = str(e)
+    
+    return result
 
 # Global TOON core instance
 _toon_core_system = None
@@ -723,6 +2424,11 @@ def get_toon_core_system() -> TOONCoreSystem:
         _toon_core_system = TOONCoreSystem()
     return _toon_core_system
 
+def set_toon_core_system(core: Optional[TOONCoreSystem]):
+    """Install the global TOON core system (None recreates it from settings on next use)"""
+    global _toon_core_system
+    _toon_core_system = core
+
 # Integration functions
 def intercept_data_flow(data: Any, context: Dict[str, Any] = None) -> Tuple[Any, Dict[str, Any]]:
     """Intercept and process any data through TOON core system"""
@@ -744,6 +2450,38 @@ def get_toon_statistics() -> Dict[str, Any]:
     core = get_toon_core_system()
     return core.get_system_statistics()
 
+# Async integration functions
+async def run_in_toon_executor(func: Callable, *args, timeout: Optional[float] = None) -> Any:
+    """Run a blocking TOON call on the async executor without blocking the event loop"""
+    import asyncio
+    
+    # Not the batch pool: calls made here may themselves fan a batch out onto it
+    executor = get_toon_core_system().get_async_executor()
+    future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    # Cancelling or timing out drops calls still queued; a call already encoding runs to completion
+    return await asyncio.wait_for(future, timeout)
+
+async def intercept_data_flow_async(data: Any, context: Dict[str, Any] = None,
+                                    timeout: Optional[float] = None) -> Tuple[Any, Dict[str, Any]]:
+    """Async variant of intercept_data_flow"""
+    return await run_in_toon_executor(intercept_data_flow, data, context, timeout=timeout)
+
+async def optimize_prompt_async(prompt: str, context: Dict[str, Any] = None, timeout: Optional[float] = None) -> str:
+    """Async variant of optimize_prompt"""
+    return await run_in_toon_executor(optimize_prompt, prompt, context, timeout=timeout)
+
+async def optimize_response_async(response: str, context: Dict[str, Any] = None,
+                                  timeout: Optional[float] = None) -> str:
+    """Async variant of optimize_response"""
+    return await run_in_toon_executor(optimize_response, response, context, timeout=timeout)
+
+async def optimize_prompts_async(prompts: List[str], context: Dict[str, Any] = None,
+                                 timeout: Optional[float] = None) -> List[str]:
+    """Optimize many prompts concurrently, each bounded by timeout"""
+    import asyncio
+    
+    return list(await asyncio.gather(*(optimize_prompt_async(prompt, context, timeout) for prompt in prompts)))
+
 if __name__ == "__main__":
     # Test the TOON core system
     core = TOONCoreSystem()
@@ -761,7 +2499,7 @@ if __name__ == "__main__":
     print("Original data:", json.dumps(test_data, indent=2))
     
     # Process through TOON
-    optimized_data, info = core.intercept_all_data(test_data, {'test': True'})
+    optimized_data, info = core.intercept_all_data(test_data, {'test': True})
     
     print("\nOptimized data:", optimized_data)
     print("\nInterception info:", json.dumps(info, indent=2))
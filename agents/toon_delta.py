@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+TOON Delta
+Compact patches between successive payloads from the same context source
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Optional, Tuple
+
+from toon_format import encode_toon
+from toon_tokenizer import count_tokens
+
+# Row fields tried, in order, as the identity of table rows
+ROW_KEY_CANDIDATES = ('id', 'path', 'name', 'key', 'file', 'uuid')
+
+def snapshot(value: Any) -> Any:
+    """Copy the containers of a JSON-compatible value so later caller mutations do not leak in"""
+    if isinstance(value, dict):
+        return {key: snapshot(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [snapshot(item) for item in value]
+    return value
+
+def diff_payloads(old: Any, new: Any) -> Dict[str, Any]:
+    """Describe how to turn old into new as set/removed paths and keyed table row changes"""
+    patch = {'set': {}, 'removed': [], 'tables': {}}
+    _diff(old, new, '', patch)
+    return {name: part for name, part in patch.items() if part}
+
+def apply_patch(base: Any, patch: Dict[str, Any]) -> Any:
+    """Apply a patch produced by diff_payloads to a copy of base"""
+    result = snapshot(base)
+
+    for path in patch.get('removed', ()):
+        parent, key = _resolve(result, path)
+        del parent[key]
+
+    for path, value in patch.get('set', {}).items():
+        if path == '':
+            result = snapshot(value)
+            continue
+        parent, key = _resolve(result, path)
+        parent[key] = snapshot(value)
+
+    for path, table in patch.get('tables', {}).items():
+        if path == '':
+            result = _apply_table(result, table)
+            continue
+        parent, key = _resolve(result, path)
+        parent[key] = _apply_table(parent[key], table)
+
+    return result
+
+def row_key(old_rows: List[Any], new_rows: List[Any]) -> Optional[str]:
+    """First candidate field that uniquely identifies rows in both tables"""
+    rows = old_rows + new_rows
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        return None
+
+    for field in ROW_KEY_CANDIDATES:
+        if all(field in row and isinstance(row[field], (str, int)) for row in rows):
+            if len({row[field] for row in old_rows}) == len(old_rows) and \
+                    len({row[field] for row in new_rows}) == len(new_rows):
+                return field
+    return None
+
+def _diff(old: Any, new: Any, path: str, patch: Dict[str, Any]):
+    if old == new:
+        return
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                patch['removed'].append(_join(path, key))
+        for key, value in new.items():
+            if key in old:
+                _diff(old[key], value, _join(path, key), patch)
+            else:
+                patch['set'][_join(path, key)] = value
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        key = row_key(old, new)
+        if key is not None:
+            table = _diff_table(old, new, key)
+            # Tables whose order changed cannot be rebuilt from row changes alone
+            if _apply_table(old, table) == new:
+                patch['tables'][path] = table
+                return
+
+    patch['set'][path] = new
+
+def _diff_table(old_rows: List[Dict[str, Any]], new_rows: List[Dict[str, Any]], key: str) -> Dict[str, Any]:
+    old_index = {row[key]: row for row in old_rows}
+    new_keys = {row[key] for row in new_rows}
+
+    table = {
+        'key': key,
+        'removed': [row[key] for row in old_rows if row[key] not in new_keys],
+        'changed': [row for row in new_rows if row[key] in old_index and old_index[row[key]] != row],
+        'added': [row for row in new_rows if row[key] not in old_index]
+    }
+    return {name: part for name, part in table.items() if part or name == 'key'}
+
+def _apply_table(rows: List[Dict[str, Any]], table: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Surviving rows keep their order, changed rows are replaced in place, new rows go last
+    key = table['key']
+    removed = set(table.get('removed', ()))
+    changed = {row[key]: row for row in table.get('changed', ())}
+    result = [snapshot(changed.get(row[key], row)) for row in rows if row[key] not in removed]
+    result.extend(snapshot(row) for row in table.get('added', ()))
+    return result
+
+def _join(path: str, key: Any) -> str:
+    # JSON Pointer escaping keeps keys containing '/' unambiguous
+    return path + '/' + str(key).replace('~', '~0').replace('/', '~1')
+
+def _resolve(root: Any, path: str) -> Tuple[Dict[str, Any], str]:
+    parts = [part.replace('~1', '/').replace('~0', '~') for part in path.split('/')[1:]]
+    parent = root
+    for part in parts[:-1]:
+        parent = parent[part]
+    return parent, parts[-1]
+
+class TOONDeltaEncoder:
+    """Per-source history of emitted payloads, used to send patches instead of full documents"""
+
+    def __init__(self, max_sources: int = 64, history: int = 4, resync_every: int = 20):
+        self.max_sources = max_sources
+        self.history = history
+        self.resync_every = resync_every
+        self.sources = OrderedDict()
+        self.lock = threading.Lock()
+        self.delta_stats = {
+            'patches': 0,
+            'full': 0,
+            'resyncs': 0,
+            'tokens_saved': 0
+        }
+
+    def encode(self, source: str, data: Any, full_output: Any, base_version: int = None) -> Tuple[Any, Dict[str, Any]]:
+        """Return (output, info): a TOON patch against the source's last version when cheaper, else full_output"""
+        with self.lock:
+            state = self.sources.get(source)
+            if state is None:
+                state = {'versions': deque(maxlen=self.history), 'next_version': 1, 'patches_since_full': 0}
+                self.sources[source] = state
+                while len(self.sources) > self.max_sources:
+                    self.sources.popitem(last=False)
+            self.sources.move_to_end(source)
+
+            version = state['next_version']
+            state['next_version'] += 1
+            base = self._base(state, base_version)
+            current = snapshot(data)
+            state['versions'].append((version, current))
+
+            info = {'source': source, 'version': version, 'mode': 'full'}
+            if base is None:
+                self.delta_stats['full'] += 1
+                return full_output, info
+
+            # Periodic full documents bound how long a missed patch can go unnoticed
+            if state['patches_since_full'] >= self.resync_every:
+                state['patches_since_full'] = 0
+                self.delta_stats['resyncs'] += 1
+                info['reason'] = 'resync'
+                return full_output, info
+
+        patch = diff_payloads(base[1], current)
+        patch_output = encode_toon({'delta': {'source': source, 'base_version': base[0], 'version': version}, **patch})
+        full_text = full_output if isinstance(full_output, str) else encode_toon(full_output)
+        patch_tokens, full_tokens = count_tokens(patch_output), count_tokens(full_text)
+
+        with self.lock:
+            if patch_tokens >= full_tokens:
+                state['patches_since_full'] = 0
+                self.delta_stats['full'] += 1
+                info['reason'] = 'patch_not_smaller'
+                return full_output, info
+
+            state['patches_since_full'] += 1
+            self.delta_stats['patches'] += 1
+            self.delta_stats['tokens_saved'] += full_tokens - patch_tokens
+
+        info.update({'mode': 'patch', 'base_version': base[0], 'tokens_saved': full_tokens - patch_tokens})
+        return patch_output, info
+
+    def reset(self, source: str = None):
+        """Forget history for one source (or all), forcing the next payload to be sent in full"""
+        with self.lock:
+            if source is None:
+                self.sources.clear()
+            else:
+                self.sources.pop(source, None)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get delta encoding statistics"""
+        with self.lock:
+            stats = dict(self.delta_stats)
+            stats['sources'] = len(self.sources)
+        return stats
+
+    def _base(self, state: Dict[str, Any], base_version: Optional[int]) -> Optional[Tuple[int, Any]]:
+        # The version before the one just being added, or one the consumer says it holds
+        versions = state['versions']
+        if base_version is None:
+            return versions[-1] if versions else None
+        for entry in versions:
+            if entry[0] == base_version:
+                return entry
+        return None
@@ -4,16 +4,29 @@ TOON DNA Integrator
 Deep integration of TOON into the core DNA of Droid and Claude systems
 """
 
+import io
 import os
-import sys
+import copy
 import json
+import queue
+import time
+import atexit
+import inspect
 import logging
+import importlib
+import builtins
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Callable
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Callable, Tuple
 import functools
 from contextlib import contextmanager
 
+# Captured at import so the scoped shim can always reach the real implementation
+_builtin_open = builtins.open
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +38,570 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class TOONFileInterceptor:
+    """Serves registered JSON files through TOON, leaving every other open() untouched"""
+    
+    def __init__(self, toon_core, max_entries: int = 128):
+        self.toon_core = toon_core
+        self.max_entries = max_entries
+        self.paths = set()
+        self.rendered = OrderedDict()
+        self.lock = threading.Lock()
+        self.scopes = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'passthrough': 0
+        }
+    
+    @staticmethod
+    def normalize(path) -> str:
+        return os.path.abspath(os.fspath(path))
+    
+    def register(self, *paths) -> List[str]:
+        """Add paths to the interception allowlist, returning the ones that were not already on it"""
+        added = []
+        with self.lock:
+            for path in paths:
+                path = self.normalize(os.path.expanduser(os.fspath(path)))
+                if path not in self.paths:
+                    self.paths.add(path)
+                    added.append(path)
+        return added
+    
+    def unregister(self, *paths):
+        """Remove paths from the allowlist and drop their rendered output"""
+        with self.lock:
+            for path in paths:
+                path = self.normalize(os.path.expanduser(os.fspath(path)))
+                self.paths.discard(path)
+                self.rendered.pop(path, None)
+    
+    def render(self, path: str) -> Optional[str]:
+        """TOON text for a registered file, or None when TOON does not apply to it"""
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        
+        with self.lock:
+            entry = self.rendered.get(path)
+            if entry is not None and entry[0] == stamp:
+                self.rendered.move_to_end(path)
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+        
+        text = None
+        try:
+            with _builtin_open(path, 'r') as f:
+                data = json.load(f)
+            processed_data, info = self.toon_core.intercept_all_data(
+                data, {'source': 'file_read', 'file_path': path}
+            )
+            if info.get('toon_applied'):
+                text = processed_data if isinstance(processed_data, str) else json.dumps(processed_data)
+        except (OSError, ValueError) as e:
+            logger.warning(f"File processing error for {path}: {e}")
+        
+        # Negative results are cached too, so unconvertible files are parsed once per change
+        with self.lock:
+            self.rendered[path] = (stamp, text)
+            self.rendered.move_to_end(path)
+            while len(self.rendered) > self.max_entries:
+                self.rendered.popitem(last=False)
+        return text
+    
+    def open(self, file, mode: str = 'r', *args, **kwargs):
+        """open() that returns TOON text for registered paths opened for text reading"""
+        if isinstance(file, (str, bytes, os.PathLike)) and mode in ('r', 'rt') and self.paths:
+            path = self.normalize(file)
+            if path in self.paths:
+                try:
+                    text = self.render(path)
+                except OSError:
+                    text = None
+                if text is not None:
+                    # Every read, chunked or not, slices the one cached rendering
+                    return io.StringIO(text)
+        
+        self.stats['passthrough'] += 1
+        return _builtin_open(file, mode, *args, **kwargs)
+    
+    @contextmanager
+    def scoped(self, *paths):
+        """Route builtins.open through the interceptor for the duration of the block"""
+        added = self.register(*paths)
+        with self.lock:
+            self.scopes += 1
+            if self.scopes == 1:
+                builtins.open = self.open
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.scopes -= 1
+                if self.scopes == 0:
+                    builtins.open = _builtin_open
+            # Paths that were registered before the block stay registered
+            self.unregister(*added)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get file interception statistics"""
+        with self.lock:
+            return {
+                'registered_paths': len(self.paths),
+                'rendered_entries': len(self.rendered),
+                'scoped': self.scopes > 0,
+                **self.stats
+            }
+
+# Functions wrapped when present; more can be listed as "module:qualname" in decorateFunctions
+DEFAULT_DECORATED_FUNCTIONS = tuple(
+    f'droid_agent_interceptor:{name}' for name in (
+        'execute_tool', 'process_prompt', 'handle_response',
+        'serialize_data', 'deserialize_data', 'execute_command'
+    )
+)
+
+class TOONFunctionRegistry:
+    """Wraps registered callables so one argument, chosen once from the signature, goes through TOON"""
+    
+    # Strings shorter than this are passed through untouched
+    STRING_MIN_LENGTH = 100
+    
+    def __init__(self, toon_core):
+        self.toon_core = toon_core
+        self.enabled = bool(toon_core.config.get('enabled', False))
+        self.functions: Dict[str, Dict[str, Any]] = {}
+        self.patched: List[Tuple[Any, str, Callable]] = []
+        self.lock = threading.Lock()
+        toon_core.config_service.subscribe(self.apply_config)
+    
+    def apply_config(self, config: Dict[str, Any]):
+        """Follow the enabled flag of reloaded config"""
+        self.enabled = bool(config.get('enabled', False))
+    
+    @staticmethod
+    def select_parameter(func: Callable, param: str = None) -> Tuple[Optional[int], Optional[str]]:
+        """Position and name of the argument to process: param if given, else the first data-typed one"""
+        try:
+            parameters = list(inspect.signature(func).parameters.values())
+        except (TypeError, ValueError):
+            return None, None
+        
+        named = [p for p in parameters if p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD)]
+        if param is not None:
+            chosen = next((p for p in named if p.name == param), None)
+            if chosen is None:
+                raise ValueError(f"{getattr(func, '__qualname__', func)} has no parameter {param!r}")
+        else:
+            # Containers beat strings, which beat the first non-self parameter
+            ranked = sorted(
+                (p for p in named if p.name not in ('self', 'cls')),
+                key=lambda p: TOONFunctionRegistry.data_rank(p.annotation)
+            )
+            chosen = ranked[0] if ranked else None
+        if chosen is None:
+            return None, None
+        
+        positional = [p for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+        index = positional.index(chosen) if chosen in positional else None
+        name = chosen.name if chosen.kind != chosen.POSITIONAL_ONLY else None
+        return index, name
+    
+    @staticmethod
+    def data_rank(annotation: Any) -> int:
+        if isinstance(annotation, str):
+            if annotation.startswith(('Dict', 'List', 'dict', 'list')):
+                return 0
+            return 1 if annotation == 'str' else 2
+        if annotation in (dict, list) or getattr(annotation, '__origin__', None) in (dict, list):
+            return 0
+        return 1 if annotation is str else 2
+    
+    def wrap(self, func: Callable, param: str = None, name: str = None) -> Callable:
+        """Return a wrapper that passes the selected argument through TOON when enabled"""
+        name = name or f"{func.__module__}:{func.__qualname__}"
+        index, keyword = self.select_parameter(func, param)
+        entry = {'function': name, 'parameter': keyword or index, 'calls': 0, 'processed': 0, 'toon_time': 0.0}
+        context = {'function': func.__name__, 'source': 'runtime_interceptor'}
+        registry = self
+        min_length = self.STRING_MIN_LENGTH
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            
+            if index is not None and index < len(args):
+                value = args[index]
+            elif keyword is not None and keyword in kwargs:
+                value = kwargs[keyword]
+            else:
+                value = None
+            
+            if not (isinstance(value, (dict, list)) or (isinstance(value, str) and len(value) > min_length)):
+                # Unlocked on the pass-through path; an occasional lost count is cheaper than a lock here
+                entry['calls'] += 1
+                return func(*args, **kwargs)
+            
+            start = time.perf_counter()
+            processed, interception_info = registry.toon_core.intercept_all_data(value, context)
+            elapsed = time.perf_counter() - start
+            with registry.lock:
+                entry['calls'] += 1
+                entry['processed'] += 1
+                entry['toon_time'] += elapsed
+            
+            if index is not None and index < len(args):
+                args = args[:index] + (processed,) + args[index + 1:]
+            else:
+                kwargs[keyword] = processed
+            
+            result = func(*args, **kwargs)
+            if isinstance(result, dict):
+                result['toon_processing'] = interception_info
+            return result
+        
+        wrapper.__toon_original__ = func
+        with self.lock:
+            self.functions[name] = entry
+        return wrapper
+    
+    def register(self, func: Callable = None, *, param: str = None, name: str = None):
+        """Decorator form of wrap(), usable bare or with arguments"""
+        if func is None:
+            return lambda target: self.wrap(target, param, name)
+        return self.wrap(func, param, name)
+    
+    def patch(self, owner: Any, attribute: str, param: str = None) -> bool:
+        """Replace owner.attribute (a module or class member) with its wrapped version"""
+        original = getattr(owner, attribute, None)
+        if not callable(original) or hasattr(original, '__toon_original__'):
+            return False
+        
+        if inspect.ismodule(owner):
+            name = f"{owner.__name__}:{attribute}"
+        else:
+            name = f"{owner.__module__}:{owner.__qualname__}.{attribute}"
+        setattr(owner, attribute, self.wrap(original, param, name))
+        with self.lock:
+            self.patched.append((owner, attribute, original))
+        return True
+    
+    def patch_target(self, target: str, param: str = None) -> bool:
+        """Patch a "module:qualname" target if the module and attribute exist"""
+        module_name, _, qualname = target.partition(':')
+        try:
+            owner = importlib.import_module(module_name)
+        except ImportError:
+            return False
+        
+        *parents, attribute = qualname.split('.')
+        for part in parents:
+            owner = getattr(owner, part, None)
+            if owner is None:
+                return False
+        return self.patch(owner, attribute, param)
+    
+    def unpatch_all(self):
+        """Restore every attribute replaced by patch()"""
+        with self.lock:
+            patched, self.patched = self.patched, []
+        for owner, attribute, original in reversed(patched):
+            setattr(owner, attribute, original)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Per-function call counts and time spent in TOON"""
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'functions': {name: dict(entry) for name, entry in self.functions.items()}
+            }
+
+class _TOONQueueHandler(QueueHandler):
+    """Queue handler that keeps large structured messages intact for the listener"""
+    
+    def __init__(self, log_queue, stage: 'TOONLogStage'):
+        super().__init__(log_queue)
+        self.stage = stage
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not self.stage.is_structured(record):
+            return super().prepare(record)
+        if not isinstance(record.msg, str):
+            # The caller may mutate its dict after logging; the listener gets its own copy
+            from toon_delta import snapshot
+            record = copy.copy(record)
+            record.msg = snapshot(record.msg)
+        return record
+
+class _TOONQueueListener(QueueListener):
+    """Queue listener that compacts structured records before handing them to the real handlers"""
+    
+    def __init__(self, log_queue, stage: 'TOONLogStage', handlers: List[logging.Handler]):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.stage = stage
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if self.stage.is_structured(record):
+            self.stage.compact(record)
+        return record
+
+class TOONLogStage:
+    """Compacts large structured log records with TOON on a background listener thread"""
+    
+    def __init__(self, toon_core, threshold: int = 500):
+        self.toon_core = toon_core
+        self.threshold = threshold
+        self.logger = None
+        self.handlers = []
+        self.queue_handler = None
+        self.listener = None
+        self.stats = {
+            'compacted': 0,
+            'skipped': 0,
+            'tokens_saved': 0
+        }
+    
+    def is_structured(self, record: logging.LogRecord) -> bool:
+        """True for JSON-like messages at or above the threshold; plain short messages cost one len()"""
+        msg = record.msg
+        if type(msg) is str:
+            return len(msg) >= self.threshold and not record.args and msg.startswith(('{', '['))
+        if isinstance(msg, (dict, list)):
+            from toon_json import estimate_size
+            return estimate_size(msg, self.threshold) >= self.threshold
+        return False
+    
+    def compact(self, record: logging.LogRecord):
+        """Replace the record's message with its TOON form when that is smaller"""
+        try:
+            data = json.loads(record.msg) if isinstance(record.msg, str) else record.msg
+            processed, info = self.toon_core.intercept_all_data(
+                data, {'source': 'logging', 'level': record.levelname.lower()}
+            )
+        except Exception:
+            self.stats['skipped'] += 1
+            return
+        
+        if info.get('toon_applied') and isinstance(processed, str):
+            record.msg = processed
+            record.args = None
+            self.stats['compacted'] += 1
+            self.stats['tokens_saved'] += info.get('tokens_saved', 0)
+        else:
+            self.stats['skipped'] += 1
+    
+    def install(self, target: logging.Logger = None) -> bool:
+        """Move target's handlers (root by default) behind a queue served by the compacting listener"""
+        if self.listener is not None:
+            return True
+        
+        target = target or logging.getLogger()
+        handlers = list(target.handlers)
+        if not handlers:
+            return False
+        
+        log_queue = queue.SimpleQueue()
+        self.queue_handler = _TOONQueueHandler(log_queue, self)
+        self.listener = _TOONQueueListener(log_queue, self, handlers)
+        
+        for handler in handlers:
+            target.removeHandler(handler)
+        target.addHandler(self.queue_handler)
+        self.logger, self.handlers = target, handlers
+        self.listener.start()
+        
+        # Stopping the listener drains records still in the queue
+        atexit.register(self.uninstall)
+        return True
+    
+    def uninstall(self):
+        """Stop the listener and give the original handlers back to the logger"""
+        if self.listener is None:
+            return
+        
+        self.listener.stop()
+        self.logger.removeHandler(self.queue_handler)
+        for handler in self.handlers:
+            self.logger.addHandler(handler)
+        self.listener = self.queue_handler = None
+        atexit.unregister(self.uninstall)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get log compaction statistics"""
+        return {
+            'installed': self.listener is not None,
+            'threshold': self.threshold,
+            **self.stats
+        }
+
+class TOONHookStage:
+    """A pipeline stage: the payload fields it reads and writes, its function and its latency budget"""
+    
+    # A stage skipped for being slow is re-measured after this many skips
+    PROBE_EVERY = 20
+    
+    def __init__(self, name: str, reads: Tuple[str, ...] = (), writes: Tuple[str, ...] = (),
+                 func: Callable[[Dict[str, Any], Dict[str, Dict[str, Any]]], Dict[str, Any]] = None,
+                 budget_ms: float = 10.0):
+        self.name = name
+        self.reads = tuple(reads)
+        self.writes = tuple(writes)
+        # Without a function the stage publishes the TOON-processed view of the fields it writes
+        self.func = func or (lambda inputs, infos: {field: inputs[field] for field in self.writes if field in inputs})
+        self.budget_ms = budget_ms
+        self.stats = {
+            'runs': 0,
+            'errors': 0,
+            'overruns': 0,
+            'skipped_budget': 0,
+            'skipped_sla': 0,
+            'total_ms': 0.0,
+            'recent_ms': 0.0
+        }
+        self.skips_since_probe = 0
+    
+    def admit(self) -> bool:
+        """False while the stage's recent latency exceeds its budget, except for periodic probes"""
+        if self.stats['recent_ms'] <= self.budget_ms:
+            return True
+        self.skips_since_probe += 1
+        if self.skips_since_probe >= self.PROBE_EVERY:
+            self.skips_since_probe = 0
+            return True
+        return False
+    
+    def record(self, elapsed_ms: float):
+        stats = self.stats
+        stats['runs'] += 1
+        stats['total_ms'] += elapsed_ms
+        # Exponential moving average, seeded by the first run
+        stats['recent_ms'] = elapsed_ms if stats['runs'] == 1 else 0.8 * stats['recent_ms'] + 0.2 * elapsed_ms
+        if elapsed_ms > self.budget_ms:
+            stats['overruns'] += 1
+
+class TOONHookPipeline:
+    """Chains hook stages over one payload, analyzing each field once and holding the chain to an SLA"""
+    
+    def __init__(self, toon_core, sla_ms: float = 50.0):
+        self.toon_core = toon_core
+        self.sla_ms = sla_ms
+        self.stages: Dict[str, TOONHookStage] = OrderedDict()
+        self.stats = {
+            'runs': 0,
+            'sla_misses': 0,
+            'fields_analyzed': 0
+        }
+    
+    def add_stage(self, stage: TOONHookStage) -> TOONHookStage:
+        """Append a stage, replacing any existing stage with the same name in place"""
+        self.stages[stage.name] = stage
+        return stage
+    
+    def run(self, payload: Dict[str, Any], stage_names: List[str] = None) -> Dict[str, Any]:
+        """Run the selected stages (all by default) in order over a dict payload"""
+        start = time.perf_counter()
+        stages = [self.stages[name] for name in stage_names] if stage_names else list(self.stages.values())
+        data = dict(payload)
+        report = {'stages': {}, 'skipped': {}}
+        
+        # Budget admission comes first, so skipped stages cost nothing, not even analysis
+        admitted = []
+        for stage in stages:
+            if stage.admit():
+                admitted.append(stage)
+            else:
+                stage.stats['skipped_budget'] += 1
+                report['skipped'][stage.name] = 'budget'
+        
+        # Fusion: each field read by an admitted stage is intercepted once, in one batch, unless
+        # an earlier admitted stage writes it first; its cost is shared by the stages reading it
+        fields = []
+        readers: Dict[str, List[str]] = {}
+        written = set()
+        for stage in admitted:
+            for field in stage.reads:
+                if field in data and field not in written:
+                    if field not in readers:
+                        fields.append(field)
+                        readers[field] = []
+                    readers[field].append(stage.name)
+            written.update(stage.writes)
+        views = {}
+        if fields:
+            results = self.toon_core.intercept_many(
+                [data[field] for field in fields],
+                [{'source': f'hook_pipeline:{field}', 'field': field} for field in fields]
+            )
+            views = dict(zip(fields, results))
+            self.stats['fields_analyzed'] += len(fields)
+        report['analysis_ms'] = (time.perf_counter() - start) * 1000
+        charges = dict.fromkeys((stage.name for stage in admitted), 0.0)
+        for field in fields:
+            for name in readers[field]:
+                charges[name] += report['analysis_ms'] / len(fields) / len(readers[field])
+        
+        for stage in admitted:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self.sla_ms:
+                stage.stats['skipped_sla'] += 1
+                report['skipped'][stage.name] = 'sla'
+                continue
+            
+            stage_start = time.perf_counter()
+            try:
+                # A field whose writer failed or was skipped is analyzed here, on this stage's clock
+                for field in stage.reads:
+                    if field in data and field not in views:
+                        views[field] = self.toon_core.intercept_all_data(
+                            data[field], {'source': f'hook_pipeline:{field}', 'field': field}
+                        )
+                        self.stats['fields_analyzed'] += 1
+                inputs = {field: views[field][0] for field in stage.reads if field in views}
+                infos = {field: views[field][1] for field in stage.reads if field in views}
+                updates = stage.func(inputs, infos) or {}
+            except Exception as e:
+                logger.error(f"Hook stage {stage.name} failed: {e}")
+                stage.stats['errors'] += 1
+                report['stages'][stage.name] = {'error': str(e)}
+                continue
+            stage_ms = (time.perf_counter() - stage_start) * 1000
+            stage.record(stage_ms + charges[stage.name])
+            
+            # Written fields are final: later readers see them as-is instead of re-analyzing
+            for field, value in updates.items():
+                if field not in stage.writes:
+                    logger.warning(f"Hook stage {stage.name} wrote undeclared field {field}")
+                    continue
+                data[field] = value
+                views[field] = (value, {'written_by': stage.name})
+            report['stages'][stage.name] = {
+                'ms': round(stage_ms, 3),
+                'analysis_ms': round(charges[stage.name], 3),
+                'wrote': [f for f in updates if f in stage.writes]
+            }
+        
+        total_ms = (time.perf_counter() - start) * 1000
+        self.stats['runs'] += 1
+        if total_ms > self.sla_ms:
+            self.stats['sla_misses'] += 1
+        report['total_ms'] = round(total_ms, 3)
+        report['analysis_ms'] = round(report['analysis_ms'], 3)
+        report['infos'] = {field: info for field, (_, info) in views.items()}
+        return {'optimized_data': data, 'hook_applied': bool(report['stages']), 'pipeline': report}
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Pipeline totals and per-stage counters"""
+        return {
+            'sla_ms': self.sla_ms,
+            **self.stats,
+            'stages': {
+                name: {'budget_ms': stage.budget_ms, **stage.stats}
+                for name, stage in self.stages.items()
+            }
+        }
+
 class TOONDNAIntegrator:
     """Integrates TOON capabilities into the core DNA of systems"""
     
@@ -59,6 +636,14 @@ class TOONDNAIntegrator:
             'agent_execution': self.agent_execution_hook,
             'context_management': self.context_management_hook
         }
+        
+        # Chained form of the prompt -> context -> agent hooks, sharing one analysis per field
+        config = self.toon_core.config
+        budget_ms = config.get('hookStageBudgetMs', 10.0)
+        self.hook_pipeline = TOONHookPipeline(self.toon_core, sla_ms=config.get('hookPipelineSlaMs', 50.0))
+        self.hook_pipeline.add_stage(TOONHookStage('prompt_processing', reads=('prompt',), writes=('prompt',), budget_ms=budget_ms))
+        self.hook_pipeline.add_stage(TOONHookStage('context_management', reads=('context',), writes=('context',), budget_ms=budget_ms))
+        self.hook_pipeline.add_stage(TOONHookStage('agent_execution', reads=('agent_input',), writes=('agent_input',), budget_ms=budget_ms))
     
     def install_system_interceptors(self):
         """Install system-level interceptors"""
@@ -124,70 +709,20 @@ class TOONDNAIntegrator:
         self.install_data_interceptors()
     
     def decorate_core_functions(self):
-        """Decorate core functions with TOON processing"""
-        # Create decorators for common function types
-        
-        def toon_processing_decorator(func: Callable) -> Callable:
-            @functools.wraps(func)
-            def wrapper(*args, **kwargs):
-                # Extract relevant data from arguments
-                data_to_process = None
-                context = {'function': func.__name__, 'source': 'runtime_interceptor'}
-                
-                # Find JSON-serializable argument
-                for arg in args:
-                    if isinstance(arg, (dict, list)):
-                        data_to_process = arg
-                        break
-                elif isinstance(arg, str) and len(arg) > 100:
-                    data_to_process = arg
-                    break
-                
-                # Process through TOON if found
-                if data_to_process is not None:
-                    processed_data, interception_info = self.toon_core.intercept_all_data(
-                        data_to_process, context
-                    )
-                    
-                    # Replace the argument with processed data
-                    new_args = []
-                    for arg in args:
-                        if arg is data_to_process:
-                            new_args.append(processed_data)
-                        else:
-                            new_args.append(arg)
-                    
-                    result = func(*new_args, **kwargs)
-                    
-                    # Add TOON metadata
-                    if isinstance(result, dict):
-                        result['toon_processing'] = interception_info
-                    
-                    return result
-                
-                # No processing needed, call original function
-                return func(*args, **kwargs)
-            
-            return wrapper
-        
-        # Apply decorator to key functions
-        self.apply_decorator_to_functions(toon_processing_decorator)
+        """Wrap core functions with TOON processing"""
+        self.function_registry = TOONFunctionRegistry(self.toon_core)
+        self.apply_decorator_to_functions()
     
-    def apply_decorator_to_functions(self, decorator: Callable):
-        """Apply decorator to core functions"""
-        # This would be expanded to actually apply decorators to real functions
-        # For now, we'll create the infrastructure
-        self.decorated_functions = {}
+    def apply_decorator_to_functions(self):
+        """Patch the default and configured decorateFunctions targets that exist in this process"""
+        targets = list(DEFAULT_DECORATED_FUNCTIONS) + list(self.toon_core.config.get('decorateFunctions', ()))
         
-        functions_to_decorate = [
-            'execute_tool', 'process_prompt', 'handle_response', 
-            'serialize_data', 'deserialize_data', 'execute_command'
-        ]
-        
-        for func_name in functions_to_decorate:
-            # In a real implementation, this would find and decorate the actual functions
-            self.decorated_functions[func_name] = decorator
-            logger.debug(f"Decorator prepared for function: {func_name}")
+        for target in targets:
+            try:
+                if self.function_registry.patch_target(target):
+                    logger.debug(f"Decorated function: {target}")
+            except Exception as e:
+                logger.warning(f"Failed to decorate {target}: {e}")
     
     def install_data_interceptors(self):
         """Install data processing interceptors"""
@@ -201,121 +736,26 @@ class TOONDNAIntegrator:
         self.intercept_logging_operations()
     
     def intercept_json_operations(self):
-        """Intercept JSON serialization/deserialization"""
-        original_json_dump = json.dump
-        original_json_load = json.load
-        
-        def toon_aware_json_dump(*args, **kwargs):
-            # Process data through TOON before JSON serialization
-            if args:
-                data = args[0]
-                if isinstance(data, (dict, list)):
-                    processed_data, _ = self.toon_core.intercept_all_data(
-                        data, {'source': 'json_dump'}
-                    )
-                    new_args = (processed_data,) + args[1:]
-                    return original_json_dump(*new_args, **kwargs)
-            
-            return original_json_dump(*args, **kwargs)
-        
-        def toon_aware_json_load(*args, **kwargs):
-            # Load data normally
-            result = original_json_load(*args, **kwargs)
-            
-            # If TOON data detected, convert back
-            if isinstance(result, str) and '\n' in result and '{' not in result:
-                # Might be TOON format, try to convert back
-                try:
-                    from toon_format import decode_toon
-                    converted = decode_toon(result)
-                    result = converted
-                except Exception:
-                    pass  # Keep original result if conversion fails
-            
-            return result
-        
-        # Replace JSON functions
-        json.dump = toon_aware_json_dump
-        json.load = toon_aware_json_load
-        logger.info("JSON operations intercepted for TOON")
+        """Expose the opt-in toon_json serializer; the stdlib json module is left untouched"""
+        # Patching json.dump/json.load globally taxed every caller, including our own settings writes
+        import toon_json
+        self.json_hooks = toon_json
+        logger.info("TOON JSON hooks available through toon_json")
     
     def intercept_file_operations(self):
-        """Intercept file read/write operations"""
-        original_open = open
-        
-        def toon_aware_open(file, mode='r', *args, **kwargs):
-            f = original_open(file, mode, *args, **kwargs)
-            
-            if 'r' in mode:
-                # For reading files, check if this is a JSON file that could be optimized
-                if file.endswith('.json') or file.endswith('.config'):
-                    try:
-                        content = f.read()
-                        f.seek(0)
-                        
-                        # Check if content would benefit from TOON
-                        try:
-                            data = json.loads(content)
-                            processed_data, info = self.toon_core.intercept_all_data(
-                                data, {'source': 'file_read', 'file_path': str(file)}
-                            )
-                            
-                            if info['toon_applied']:
-                                # Create a file-like object with processed data
-                                class TOONFileWrapper:
-                                    def __init__(self, processed_data, original_file):
-                                        self.data = processed_data
-                                        self.original_file = original_file
-                                    
-                                    def read(self, size=-1):
-                                        if size == -1:
-                                            return json.dumps(self.data)
-                                        return json.dumps(self.data)[:size]
-                                    
-                                    def __getattr__(self, name):
-                                        return getattr(self.original_file, name)
-                                
-                                return TOONFileWrapper(processed_data, f)
-                        
-                        except json.JSONDecodeError:
-                            pass  # Not JSON, keep original file
-                    
-                    except Exception as e:
-                        logger.warning(f"File processing error: {e}")
-            
-            return f
-        
-        # Replace open function
-        import builtins
-        builtins.open = toon_aware_open
-        logger.info("File operations intercepted for TOON")
+        """Set up opt-in interception for the files listed in fileInterceptionPaths"""
+        self.file_interceptor = TOONFileInterceptor(
+            self.toon_core, max_entries=self.toon_core.config.get('fileInterceptionCacheSize', 128)
+        )
+        self.file_interceptor.register(*self.toon_core.config.get('fileInterceptionPaths', ()))
+        logger.info(f"File interception ready for {len(self.file_interceptor.paths)} registered paths")
     
     def intercept_logging_operations(self):
-        """Intercept logging to optimize log messages"""
-        import logging
-        
-        original_logger = logging.getLogger
-        
-        def toon_aware_logger(name):
-            logger_instance = original_logger(name)
-            
-            # Hook logging methods
-            original_info = logger_instance.info
-            def toon_aware_info(msg, *args, **kwargs):
-                if isinstance(msg, str) and len(msg) > 500:
-                    # Optimize long log messages
-                    optimized_msg, _ = self.toon_core.intercept_all_data(
-                        msg, {'source': 'logging', 'level': 'info'}
-                    )
-                    return original_info(optimized_msg, *args, **kwargs)
-                return original_info(msg, *args, **kwargs)
-            
-            logger_instance.info = toon_aware_info
-            return logger_instance
-        
-        # Replace logger function
-        logging.getLogger = toon_aware_logger
-        logger.info("Logging operations intercepted for TOON")
+        """Compact large structured log records off the calling thread"""
+        config = self.toon_core.config
+        self.log_stage = TOONLogStage(self.toon_core, threshold=config.get('logCompactThreshold', 500))
+        if config.get('optimizeLogs', True) and self.log_stage.install():
+            logger.info("Logging operations routed through the TOON log stage")
     
     def prompt_processing_hook(self, prompt_data: Dict[str, Any]) -> Dict[str, Any]:
         """Hook for prompt processing pipeline"""
@@ -457,6 +897,14 @@ class TOONDNAIntegrator:
         else:
             return {'optimized_data': data, 'hook_applied': False}
     
+    def execute_pipeline(self, data: Dict[str, Any], stage_names: List[str] = None) -> Dict[str, Any]:
+        """Run chained hook stages over a payload of named fields"""
+        try:
+            return self.hook_pipeline.run(data, stage_names)
+        except Exception as e:
+            logger.error(f"Hook pipeline failed: {e}")
+            return {'optimized_data': data, 'hook_applied': False, 'error': str(e)}
+    
     def complete_integration(self):
         """Complete the TOON DNA integration"""
         try:
@@ -518,6 +966,10 @@ class TOONDNAIntegrator:
             'interceptors_active': self.interceptors_active,
             'toon_core_stats': self.toon_core.get_system_statistics(),
             'available_hooks': list(self.dna_hooks.keys()),
+            'hook_pipeline': self.hook_pipeline.get_statistics(),
+            'file_interception': self.file_interceptor.get_statistics() if hasattr(self, 'file_interceptor') else None,
+            'log_compaction': self.log_stage.get_statistics() if hasattr(self, 'log_stage') else None,
+            'decorated_functions': self.function_registry.get_statistics() if hasattr(self, 'function_registry') else None,
             'timestamp': datetime.now().isoformat()
         }
     
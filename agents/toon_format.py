@@ -0,0 +1,744 @@
+#!/usr/bin/env python3
+"""
+TOON Format
+Token-Oriented Object Notation encoder and token analysis helpers
+"""
+
+import re
+import sys
+import json
+import math
+import mmap
+import shutil
+import tempfile
+import itertools
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+from typing import Dict, List, Any, Iterable, Iterator, TextIO
+
+from toon_tokenizer import get_token_counter, count_tokens_batch
+
+# Bumped whenever encoder output changes, invalidating cached conversions
+TOON_FORMAT_VERSION = 2
+
+# Rough characters-per-token ratio for callers that need a fixed estimate
+CHARS_PER_TOKEN = 4
+
+# In-memory budget before streamed rows spill to a temporary file
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+_SAFE_KEY = re.compile(r'[A-Za-z_][A-Za-z0-9_.]*\Z')
+_NUMERIC_LIKE = re.compile(r'-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?\Z')
+_QUOTE_TRIGGERS = set(':"\\[]{}\n\r\t')
+_ESCAPES = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+_PRIMITIVES = (str, int, float, bool, type(None))
+_UNESCAPES = {'\\': '\\', '"': '"', 'n': '\n', 'r': '\r', 't': '\t'}
+_ESCAPE_SEQUENCE = re.compile(r'\\(.)')
+_INTEGER = re.compile(r'^-?\d+$')
+_ARRAY_HEADER = re.compile(r'^\[(\d+)([|\t])?\](?:\{(.*)\})?:(.*)$')
+_REFERENCE = re.compile(r'^\$(\d+)(?:\+(.*))?$')
+_LEGEND_KEY = '@legend'
+
+def is_primitive(value: Any) -> bool:
+    """Return True for values TOON emits inline (strings, numbers, booleans, null)"""
+    return isinstance(value, _PRIMITIVES)
+
+def estimate_tokens(text: str) -> int:
+    """Count the tokens of a string with the configured token counter"""
+    return get_token_counter().count(text) if text else 0
+
+def estimate_tokens_for_size(char_count: int) -> int:
+    """Estimate the token count of text with the given length"""
+    return get_token_counter().estimate_for_size(char_count)
+
+def quote_string(value: str) -> str:
+    """Quote and escape a string for TOON output"""
+    return '"' + ''.join(_ESCAPES.get(ch, ch) for ch in value) + '"'
+
+def encode_key(key: Any) -> str:
+    """Encode an object key, quoting it when it is not a bare identifier"""
+    key = str(key)
+    if _SAFE_KEY.match(key):
+        return key
+    return quote_string(key)
+
+def encode_primitive(value: Any, delimiter: str = ',') -> str:
+    """Encode a primitive value as a TOON scalar"""
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return 'null'
+        # Same text as json.dumps, so 1.0 decodes back to a float rather than an int
+        return repr(value)
+
+    value = str(value)
+    if needs_quotes(value, delimiter):
+        return quote_string(value)
+    return value
+
+def needs_quotes(value: str, delimiter: str = ',') -> bool:
+    """Determine whether a string must be quoted to round-trip"""
+    if not value or value != value.strip():
+        return True
+    if value in ('true', 'false', 'null') or value.startswith('-'):
+        return True
+    if delimiter in value or _NUMERIC_LIKE.match(value):
+        return True
+    return any(ch in _QUOTE_TRIGGERS for ch in value)
+
+def array_header(length: int, fields: List[str] = None, delimiter: str = ',') -> str:
+    """Build an array header such as ``[3]`` or ``[3]{id,name}``"""
+    marker = '' if delimiter == ',' else delimiter
+    header = f'[{length}{marker}]'
+    if fields is not None:
+        header += '{' + delimiter.join(encode_key(field) for field in fields) + '}'
+    return header
+
+def tabular_fields(items: List[Any]) -> List[str]:
+    """Return the shared field list if items form a uniform table, else None"""
+    if not items or not isinstance(items[0], dict) or not items[0]:
+        return None
+
+    fields = list(items[0].keys())
+    field_set = set(fields)
+    for item in items:
+        if not isinstance(item, dict) or len(item) != len(fields) or item.keys() != field_set:
+            return None
+        if not all(isinstance(v, _PRIMITIVES) for v in item.values()):
+            return None
+
+    return fields
+
+def encode_toon(data: Any, indent: int = 2, delimiter: str = ',', table_schemas: Dict[tuple, str] = None,
+                dictionary: bool = False) -> str:
+    """Encode JSON-compatible data as a TOON document, reusing and filling table_schemas headers"""
+    legend = build_legend(data, delimiter) if dictionary else None
+    if table_schemas is None:
+        return '\n'.join(iter_encode_toon(data, indent, delimiter, table_schemas, legend))
+
+    try:
+        return '\n'.join(iter_encode_toon(data, indent, delimiter, table_schemas, legend))
+    except ValueError:
+        # A cached shape matched the first row but not the rest; rediscover
+        return '\n'.join(iter_encode_toon(data, indent, delimiter, None, legend))
+
+def iter_encode_toon(data: Any, indent: int = 2, delimiter: str = ',',
+                     table_schemas: Dict[tuple, str] = None, legend: 'TOONLegend' = None) -> Iterator[str]:
+    """Yield the lines of a TOON document one at a time"""
+    if legend is not None:
+        yield legend.header_line(delimiter)
+
+    if isinstance(data, dict):
+        yield from _iter_object(data, 0, indent, delimiter, table_schemas, legend)
+    elif isinstance(data, list):
+        yield from _iter_array('', data, 0, indent, delimiter, table_schemas, legend)
+    else:
+        yield encode_primitive(data, delimiter)
+
+def dump_toon(data: Any, fp: TextIO, indent: int = 2, delimiter: str = ',') -> int:
+    """Stream a TOON document to a file-like object, returning characters written"""
+    return _write_lines(iter_encode_toon(data, indent, delimiter), fp)
+
+def iter_toon_rows(rows: Iterable[Dict[str, Any]], fields: List[str], depth: int = 1,
+                   indent: int = 2, delimiter: str = ',', legend: 'TOONLegend' = None) -> Iterator[str]:
+    """Yield tabular rows for dicts sharing the given fields"""
+    pad = ' ' * (indent * depth)
+    field_set = set(fields)
+    encode = legend.encode if legend is not None else encode_primitive
+
+    for row in rows:
+        if not isinstance(row, dict) or len(row) != len(fields) or row.keys() != field_set:
+            raise ValueError(f'Row does not match table fields {fields}: {row!r:.80}')
+        values = []
+        for field in fields:
+            value = row[field]
+            if not isinstance(value, _PRIMITIVES):
+                raise ValueError(f'Non-primitive value for field {field!r} in tabular row')
+            values.append(encode(value, delimiter))
+        yield pad + delimiter.join(values)
+
+def dump_toon_rows(rows: Iterable[Any], fp: TextIO, key: str = None, fields: List[str] = None,
+                   length: int = None, tabular: bool = None, indent: int = 2, delimiter: str = ',') -> int:
+    """Stream an iterable of rows (e.g. a JSONL reader) to fp as one TOON array"""
+    iterator = iter(rows)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return _write_lines([_key_prefix(key) + array_header(0, None, delimiter) + ':'], fp)
+
+    # Layout is fixed by the first row; later rows that do not fit raise ValueError
+    if tabular is None:
+        tabular = isinstance(first, dict) and bool(first) and all(isinstance(v, _PRIMITIVES) for v in first.values())
+    if tabular and fields is None:
+        fields = list(first.keys())
+
+    counted = _CountingIterator(itertools.chain([first], iterator))
+    if tabular:
+        body = iter_toon_rows(counted, fields, 1, indent, delimiter)
+    else:
+        body = _iter_list_items(counted, 1, indent, delimiter)
+
+    if length is not None:
+        written = _write_lines([_key_prefix(key) + array_header(length, fields, delimiter) + ':'], fp)
+        written += _write_lines(body, fp, leading_newline=True)
+        if counted.count != length:
+            raise ValueError(f'Expected {length} rows, got {counted.count}')
+        return written
+
+    # The header carries the row count, so spool rows (spilling to disk) until it is known
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode='w+') as spool:
+        _write_lines(body, spool, leading_newline=True)
+        written = _write_lines([_key_prefix(key) + array_header(counted.count, fields, delimiter) + ':'], fp)
+        spool.seek(0)
+        shutil.copyfileobj(spool, fp)
+        return written + spool.tell()
+
+class _CountingIterator:
+    """Iterator wrapper that records how many items were consumed"""
+
+    def __init__(self, iterable: Iterable[Any]):
+        self.iterator = iter(iterable)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self.iterator)
+        self.count += 1
+        return item
+
+def _key_prefix(key: str) -> str:
+    return encode_key(key) if key else ''
+
+def _write_lines(lines: Iterable[str], fp: TextIO, leading_newline: bool = False) -> int:
+    written = 0
+    separator = '\n' if leading_newline else ''
+    for line in lines:
+        chunk = separator + line
+        fp.write(chunk)
+        written += len(chunk)
+        separator = '\n'
+    return written
+
+def _iter_object(obj: Dict[str, Any], depth: int, indent: int, delimiter: str,
+                 schemas: Dict[tuple, str] = None, legend: 'TOONLegend' = None) -> Iterator[str]:
+    pad = ' ' * (indent * depth)
+
+    for key, value in obj.items():
+        encoded_key = encode_key(key)
+
+        if isinstance(value, dict):
+            yield f'{pad}{encoded_key}:'
+            yield from _iter_object(value, depth + 1, indent, delimiter, schemas, legend)
+        elif isinstance(value, list):
+            yield from _iter_array(encoded_key, value, depth, indent, delimiter, schemas, legend)
+        else:
+            yield f'{pad}{encoded_key}: {encode_primitive(value, delimiter)}'
+
+def _iter_array(prefix: str, items: List[Any], depth: int, indent: int, delimiter: str,
+                schemas: Dict[tuple, str] = None, legend: 'TOONLegend' = None) -> Iterator[str]:
+    pad = ' ' * (indent * depth)
+
+    if not items:
+        yield f'{pad}{prefix}{array_header(0, None, delimiter)}:'
+        return
+
+    # Known table shape: reuse the header and go straight to rows (rows still validate)
+    if schemas is not None and type(items[0]) is dict:
+        shape = tuple(items[0])
+        header_fields = schemas.get(shape)
+        if header_fields is not None and all(type(item) is dict and item.keys() == items[0].keys() for item in items):
+            yield f'{pad}{prefix}{array_header(len(items), None, delimiter)}{header_fields}:'
+            yield from iter_toon_rows(items, list(shape), depth + 1, indent, delimiter, legend)
+            return
+
+    if all(isinstance(item, _PRIMITIVES) for item in items):
+        values = delimiter.join(encode_primitive(item, delimiter) for item in items)
+        yield f'{pad}{prefix}{array_header(len(items), None, delimiter)}: {values}'
+        return
+
+    fields = tabular_fields(items)
+    if fields is not None:
+        # Header once, then one line per row
+        header = array_header(len(items), fields, delimiter)
+        if schemas is not None:
+            schemas[tuple(fields)] = header[header.index('{'):]
+        yield f'{pad}{prefix}{header}:'
+        yield from iter_toon_rows(items, fields, depth + 1, indent, delimiter, legend)
+        return
+
+    yield f'{pad}{prefix}{array_header(len(items), None, delimiter)}:'
+    yield from _iter_list_items(items, depth + 1, indent, delimiter, schemas, legend)
+
+def _iter_list_items(items: Iterable[Any], depth: int, indent: int, delimiter: str,
+                     schemas: Dict[tuple, str] = None, legend: 'TOONLegend' = None) -> Iterator[str]:
+    pad = ' ' * (indent * depth)
+
+    for item in items:
+        if isinstance(item, dict):
+            if not item:
+                yield f'{pad}-'
+                continue
+            # First field shares the hyphen line, the rest align beneath it
+            lines = _iter_object(item, depth + 1, indent, delimiter, schemas, legend)
+        elif isinstance(item, list):
+            lines = _iter_array('', item, depth, indent, delimiter, schemas, legend)
+        else:
+            yield f'{pad}- {encode_primitive(item, delimiter)}'
+            continue
+
+        yield f'{pad}- ' + next(lines).lstrip(' ')
+        yield from lines
+
+class TOONLegend:
+    """Dictionary of repeated table values and path prefixes referenced as $id in rows"""
+
+    def __init__(self, entries: List[str], values: Dict[str, int], prefixes: Dict[str, int]):
+        self.entries = entries
+        self.values = values
+        self.prefixes = prefixes
+
+    def header_line(self, delimiter: str = ',') -> str:
+        """Legend line emitted ahead of the document body"""
+        entries = delimiter.join(encode_primitive(entry, delimiter) for entry in self.entries)
+        return f'{_LEGEND_KEY}{array_header(len(self.entries), None, delimiter)}: {entries}'
+
+    def encode(self, value: Any, delimiter: str = ',') -> str:
+        """Encode a table cell, replacing legend values and prefixes with references"""
+        if type(value) is not str:
+            return encode_primitive(value, delimiter)
+
+        index = self.values.get(value)
+        if index is not None:
+            return f'${index}'
+
+        cut = value.rfind('/') + 1
+        index = self.prefixes.get(value[:cut]) if cut else None
+        if index is not None:
+            rest = value[cut:]
+            if _is_reference_suffix(rest, delimiter):
+                return f'${index}+{rest}'
+
+        encoded = encode_primitive(value, delimiter)
+        # Unquoted $ cells are references, so literal ones must be quoted
+        return quote_string(value) if encoded.startswith('$') else encoded
+
+def build_legend(data: Any, delimiter: str = ',', min_count: int = 2) -> 'TOONLegend':
+    """Pick table values and path prefixes whose references save tokens, or None"""
+    values = Counter()
+    for cell in _iter_table_cells(data):
+        if type(cell) is str and len(cell) > 3:
+            values[cell] += 1
+
+    counter = get_token_counter()
+    reference_tokens = counter.count('$00')
+    chosen_values = {}
+    prefixes = Counter()
+
+    for value, count in values.items():
+        cost = counter.count(encode_primitive(value, delimiter))
+        # Each use saves the value minus a reference; the legend pays for it once
+        if count >= min_count and count * (cost - reference_tokens) > cost + 1:
+            chosen_values[value] = count
+        else:
+            cut = value.rfind('/') + 1
+            if cut and _is_reference_suffix(value[cut:], delimiter):
+                prefixes[value[:cut]] += count
+
+    chosen_prefixes = {}
+    for prefix, count in prefixes.items():
+        cost = counter.count(encode_primitive(prefix, delimiter))
+        if count >= min_count and count * (cost - reference_tokens - 1) > cost + 1:
+            chosen_prefixes[prefix] = count
+
+    if not chosen_values and not chosen_prefixes:
+        return None
+
+    # Most frequent entries get the shortest ids
+    ranked = sorted(itertools.chain(chosen_values.items(), chosen_prefixes.items()), key=lambda item: -item[1])
+    entries = [entry for entry, _ in ranked]
+    return TOONLegend(
+        entries,
+        {entry: i for i, entry in enumerate(entries) if entry in chosen_values},
+        {entry: i for i, entry in enumerate(entries) if entry in chosen_prefixes}
+    )
+
+def _iter_table_cells(node: Any) -> Iterator[Any]:
+    if isinstance(node, dict):
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from _iter_table_cells(value)
+    elif isinstance(node, list):
+        if node and not all(isinstance(item, _PRIMITIVES) for item in node) and tabular_fields(node) is not None:
+            for row in node:
+                yield from row.values()
+        else:
+            for item in node:
+                if isinstance(item, (dict, list)):
+                    yield from _iter_table_cells(item)
+
+def _is_reference_suffix(rest: str, delimiter: str) -> bool:
+    return bool(rest) and rest == rest.strip() and delimiter not in rest and not any(ch in _QUOTE_TRIGGERS for ch in rest)
+
+class TOONTable(Sequence):
+    """Columnar TOON table that materializes row dicts only on access"""
+
+    __slots__ = ('fields', 'columns', 'length')
+
+    def __init__(self, fields: List[str], columns: List[Sequence], length: int):
+        self.fields = fields
+        self.columns = columns
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('TOONTable index out of range')
+        return self.row(index)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """Materialize a single row as a dict"""
+        return {field: column[index] for field, column in zip(self.fields, self.columns)}
+
+    def column(self, field: str) -> Sequence:
+        """Return the stored values of one column without building rows"""
+        return self.columns[self.fields.index(field)]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Materialize every row"""
+        return [self.row(i) for i in range(self.length)]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (TOONTable, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'TOONTable(fields={self.fields}, rows={self.length})'
+
+def decode_toon(text: str, indent: int = 2, lazy_tables: bool = False) -> Any:
+    """Decode a TOON document (lazy_tables returns TOONTable for tabular arrays)"""
+    # str.splitlines() also breaks on \x0b, \x0c, \x1c-\x1e, \x85 and \u2028/\u2029, which
+    # the encoder leaves unescaped inside values; only \n (or \r\n) ends a TOON line
+    lines = (line[:-1] if line.endswith('\r') else line for line in text.split('\n'))
+    return _TOONParser(lines, indent, lazy_tables).parse()
+
+def load_toon(path: str, indent: int = 2, lazy_tables: bool = True) -> Any:
+    """Decode a .toon file through mmap, keeping tables columnar by default"""
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return {}
+        with mapped:
+            lines = (raw.decode('utf-8').rstrip('\r\n') for raw in iter(mapped.readline, b''))
+            return _TOONParser(lines, indent, lazy_tables).parse()
+
+def decode_primitive(token: str) -> Any:
+    """Decode a TOON scalar token"""
+    token = token.strip()
+    if token.startswith('"'):
+        return _unescape(token[1:-1])
+    if token == 'true':
+        return True
+    if token == 'false':
+        return False
+    if token == 'null':
+        return None
+    if _NUMERIC_LIKE.match(token):
+        if _INTEGER.match(token):
+            return int(token)
+        return float(token)
+    return token
+
+def split_delimited(text: str, delimiter: str = ',') -> List[str]:
+    """Split a row on the delimiter, ignoring delimiters inside quoted strings"""
+    if '"' not in text:
+        return text.split(delimiter)
+
+    parts = []
+    current = []
+    in_quotes = False
+    escaped = False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif ch == '\\' and in_quotes:
+            escaped = True
+        elif ch == '"':
+            in_quotes = not in_quotes
+        elif ch == delimiter and not in_quotes:
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append(''.join(current))
+    return parts
+
+def _unescape(value: str) -> str:
+    if '\\' not in value:
+        return value
+    return _ESCAPE_SEQUENCE.sub(lambda m: _UNESCAPES.get(m.group(1), m.group(1)), value)
+
+def _compact_column(values: List[Any]) -> Sequence:
+    """Store homogeneous numeric columns as typed arrays"""
+    if values and all(type(v) is int for v in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            return values
+    if values and all(type(v) is float for v in values):
+        return array('d', values)
+    return values
+
+class _TOONParser:
+    """Indentation-driven TOON parser over an iterator of lines"""
+
+    def __init__(self, lines: Iterable[str], indent: int, lazy_tables: bool):
+        self.lines = iter(lines)
+        self.indent = indent
+        self.lazy_tables = lazy_tables
+        self.pending = None
+        self.line_number = 0
+        self.legend = None
+
+    def peek(self):
+        """Return the next non-blank (depth, content) pair without consuming it"""
+        while self.pending is None:
+            try:
+                line = next(self.lines)
+            except StopIteration:
+                return None
+            self.line_number += 1
+            content = line.lstrip(' ')
+            if content:
+                self.pending = ((len(line) - len(content)) // self.indent, content)
+        return self.pending
+
+    def take(self):
+        entry = self.peek()
+        self.pending = None
+        return entry
+
+    def error(self, message: str) -> ValueError:
+        return ValueError(f'TOON line {self.line_number}: {message}')
+
+    def parse(self) -> Any:
+        first = self.peek()
+        if first is not None and first[1].startswith(_LEGEND_KEY + '['):
+            self.take()
+            self.legend = self.parse_array(first[1][len(_LEGEND_KEY):], 0)
+            first = self.peek()
+        if first is None:
+            return {}
+
+        depth, content = first
+        if _ARRAY_HEADER.match(content):
+            self.take()
+            return self.parse_array(content, depth)
+        if self.split_key(content) is not None:
+            return self.parse_object(depth)
+
+        self.take()
+        return decode_primitive(content)
+
+    def split_key(self, content: str):
+        """Split 'key: ...' or 'key[N]...' into (key, remainder), or None for scalars"""
+        if content.startswith('"'):
+            end = 1
+            while end < len(content):
+                if content[end] == '\\':
+                    end += 2
+                    continue
+                if content[end] == '"':
+                    break
+                end += 1
+            key = _unescape(content[1:end])
+            rest = content[end + 1:]
+        else:
+            cut = len(content)
+            for marker in (':', '['):
+                position = content.find(marker)
+                if position != -1 and position < cut:
+                    cut = position
+            key = content[:cut]
+            rest = content[cut:]
+            if not _SAFE_KEY.match(key):
+                return None
+
+        if rest.startswith(':') or (rest.startswith('[') and _ARRAY_HEADER.match(rest)):
+            return sys.intern(key), rest
+        return None
+
+    def parse_object(self, depth: int, result: Dict[str, Any] = None) -> Dict[str, Any]:
+        result = {} if result is None else result
+        while True:
+            entry = self.peek()
+            if entry is None or entry[0] < depth:
+                return result
+            if entry[0] > depth:
+                raise self.error('unexpected indentation')
+            self.take()
+            key, value = self.parse_field(entry[1], depth)
+            result[key] = value
+
+    def parse_field(self, content: str, depth: int):
+        split = self.split_key(content)
+        if split is None:
+            raise self.error(f'expected a key in {content!r:.60}')
+
+        key, rest = split
+        if rest.startswith('['):
+            return key, self.parse_array(rest, depth)
+
+        inline = rest[1:].strip()
+        if inline:
+            return key, decode_primitive(inline)
+        return key, self.parse_object(depth + 1)
+
+    def parse_array(self, header: str, depth: int) -> Any:
+        match = _ARRAY_HEADER.match(header)
+        if match is None:
+            raise self.error(f'invalid array header {header!r:.60}')
+
+        length = int(match.group(1))
+        delimiter = match.group(2) or ','
+        fields_text = match.group(3)
+        inline = match.group(4)
+
+        if fields_text is not None:
+            fields = [sys.intern(decode_primitive(f)) if f.startswith('"') else sys.intern(f)
+                      for f in split_delimited(fields_text, delimiter)]
+            return self.parse_table(fields, length, depth + 1, delimiter)
+
+        if inline.strip():
+            return [decode_primitive(token) for token in split_delimited(inline, delimiter)]
+
+        if length == 0:
+            return []
+
+        return self.parse_list_items(length, depth + 1)
+
+    def parse_table(self, fields: List[str], length: int, depth: int, delimiter: str) -> Any:
+        columns = [[] for _ in fields]
+        width = len(fields)
+
+        for _ in range(length):
+            entry = self.take()
+            if entry is None or entry[0] != depth:
+                raise self.error(f'expected {length} table rows')
+            values = split_delimited(entry[1], delimiter)
+            if len(values) != width:
+                raise self.error(f'row has {len(values)} values, expected {width}')
+            for column, token in zip(columns, values):
+                if self.legend is not None and token.lstrip(' ').startswith('$'):
+                    value = self.resolve_reference(token.strip())
+                else:
+                    value = decode_primitive(token)
+                # Enum-like strings recur constantly; share one instance
+                if type(value) is str and len(value) <= 64:
+                    value = sys.intern(value)
+                column.append(value)
+
+        if self.lazy_tables:
+            return TOONTable(fields, [_compact_column(column) for column in columns], length)
+        return [dict(zip(fields, row)) for row in zip(*columns)]
+
+    def resolve_reference(self, token: str) -> str:
+        match = _REFERENCE.match(token)
+        if match is None or int(match.group(1)) >= len(self.legend):
+            raise self.error(f'invalid legend reference {token!r:.60}')
+        return self.legend[int(match.group(1))] + (match.group(2) or '')
+
+    def parse_list_items(self, length: int, depth: int) -> List[Any]:
+        items = []
+
+        for _ in range(length):
+            entry = self.take()
+            if entry is None or entry[0] != depth or not entry[1].startswith('-'):
+                raise self.error(f'expected {length} list items')
+
+            content = entry[1]
+            if content == '-':
+                items.append({})
+                continue
+
+            rest = content[2:]
+            if _ARRAY_HEADER.match(rest):
+                items.append(self.parse_array(rest, depth))
+            elif self.split_key(rest) is not None:
+                # First field sits on the hyphen line, the rest one level deeper
+                key, value = self.parse_field(rest, depth + 1)
+                items.append(self.parse_object(depth + 1, {key: value}))
+            else:
+                items.append(decode_primitive(rest))
+
+        return items
+
+def analyze_tokens(data: Any) -> Dict[str, Any]:
+    """Compare estimated token usage of compact JSON and TOON for the same data"""
+    json_str = json.dumps(data, separators=(',', ':'))
+    toon_str = encode_toon(data)
+
+    json_tokens, toon_tokens = count_tokens_batch([json_str, toon_str])
+    tokens_saved = json_tokens - toon_tokens
+    savings_percent = (tokens_saved / json_tokens * 100) if json_tokens else 0.0
+
+    return {
+        'json_size': len(json_str),
+        'toon_size': len(toon_str),
+        'json_tokens': json_tokens,
+        'toon_tokens': toon_tokens,
+        'tokens_saved': tokens_saved,
+        'savings_percent': round(savings_percent, 2),
+        'recommended': tokens_saved > 0
+    }
+
+def iter_jsonl(fp: TextIO) -> Iterator[Any]:
+    """Yield one decoded value per non-empty line of a JSONL stream"""
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        # Stream a JSONL export into a TOON array: toon_format.py input.jsonl output.toon
+        with open(sys.argv[1], 'r') as src, open(sys.argv[2], 'w') as dst:
+            try:
+                written = dump_toon_rows(iter_jsonl(src), dst)
+            except ValueError:
+                # Rows are not uniform; fall back to list layout
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+                written = dump_toon_rows(iter_jsonl(src), dst, tabular=False)
+        print(f"Wrote {written} characters to {sys.argv[2]}")
+        sys.exit(0)
+
+    sample = {
+        "users": [
+            {"id": 1, "name": "Alice", "role": "admin"},
+            {"id": 2, "name": "Bob", "role": "user"}
+        ],
+        "tags": ["a", "b", "c"]
+    }
+
+    print(encode_toon(sample))
+    print(json.dumps(analyze_tokens(sample), indent=2))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+TOON JSON
+Opt-in drop-in for json.dump/load/dumps/loads that routes large documents through TOON
+"""
+
+import json
+from typing import Any, Dict, TextIO
+
+# Documents estimated below this many characters are serialized by the stdlib untouched
+SMALL_OBJECT_CHARS = 2048
+
+def estimate_size(obj: Any, limit: int) -> int:
+    """Rough compact-JSON length of obj, giving up as soon as it reaches limit"""
+    size = 0
+    stack = [obj]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        node = pop()
+        # Exact type checks keep the common case cheap; subclasses take the isinstance path
+        kind = type(node)
+        if kind is not str and kind is not dict and kind is not list:
+            kind = dict if isinstance(node, dict) else list if isinstance(node, (list, tuple)) else None
+
+        if kind is str:
+            size += len(node) + 2
+        elif kind is dict:
+            # Braces, plus quotes, colon and comma per member
+            try:
+                size += 2 + 4 * len(node) + sum(map(len, node))
+            except TypeError:
+                size += 2 + 12 * len(node)
+            extend(node.values())
+        elif kind is list:
+            size += 2 + len(node)
+            extend(node)
+        else:
+            size += 8
+        if size >= limit:
+            return size
+    return size
+
+def dumps(obj: Any, *, toon: bool = True, min_size: int = SMALL_OBJECT_CHARS,
+          context: Dict[str, Any] = None, **kwargs) -> str:
+    """Serialize obj as TOON when the core system finds it worthwhile, otherwise as JSON"""
+    if not toon or not isinstance(obj, (dict, list)) or estimate_size(obj, min_size) < min_size:
+        return json.dumps(obj, **kwargs)
+
+    from toon_core_system import get_toon_core_system
+
+    # The text must decode back to obj on its own: no delta patches, no budget truncation
+    context = {'source': 'toon_json', **(context or {}), 'delta': False, 'token_budget': None}
+    processed, info = get_toon_core_system().intercept_all_data(obj, context)
+    if info.get('toon_applied') and isinstance(processed, str):
+        return processed
+    return json.dumps(obj, **kwargs)
+
+def dump(obj: Any, fp: TextIO, *, toon: bool = True, min_size: int = SMALL_OBJECT_CHARS,
+         context: Dict[str, Any] = None, **kwargs):
+    """Serialize obj to a text file with dumps()"""
+    fp.write(dumps(obj, toon=toon, min_size=min_size, context=context, **kwargs))
+
+def loads(s: str, **kwargs) -> Any:
+    """Parse JSON, falling back to TOON for text written by dumps()"""
+    try:
+        return json.loads(s, **kwargs)
+    except json.JSONDecodeError as error:
+        json_error = error
+
+    from toon_format import decode_toon
+
+    # dumps() only emits TOON for dicts and lists, so any other decode is not ours
+    try:
+        text = s.decode('utf-8') if isinstance(s, (bytes, bytearray)) else s
+        decoded = decode_toon(text) if text.strip() else None
+    except (ValueError, UnicodeDecodeError):
+        decoded = None
+    if not isinstance(decoded, (dict, list)):
+        raise json_error
+    return decoded
+
+def load(fp: TextIO, **kwargs) -> Any:
+    """Parse a JSON or TOON text file with loads()"""
+    return loads(fp.read(), **kwargs)
+
+if __name__ == "__main__":
+    import sys
+
+    document = json.load(sys.stdin)
+    sys.stdout.write(dumps(document, indent=2))
+    sys.stdout.write('\n')
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+TOON Tokenizer
+Token counting engine used to measure TOON savings
+"""
+
+import os
+import re
+import math
+import base64
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable
+
+# Offline BPE vocabulary in tiktoken format ("<base64 token> <rank>" per line)
+DEFAULT_VOCAB_PATH = Path(os.path.expanduser('~/.factory/cache/toon/tokenizer.tiktoken'))
+
+# The cl100k_base pre-tokenizer; BPE never merges across these pieces, so
+# summing per-piece counts gives the same total as encoding the whole text
+CL100K_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+"""
+    r"""|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+)
+
+# Same split for the stdlib re, which has no \p{..} classes: letters are [^\W\d_],
+# numbers are \d, and "neither" is any other character or underscore
+_CL100K_STDLIB_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|(?:[^\r\n\w]|_)?[^\W\d_]+|\d{1,3}| ?(?:[^\s\w]|_)+[\r\n]*"""
+    r"""|\s+\Z|\s*[\r\n]|\s+(?!\S)|\s"""
+)
+
+try:
+    import regex as _regex
+    PRETOKENIZE_PATTERN = _regex.compile(CL100K_PATTERN)
+except ImportError:
+    PRETOKENIZE_PATTERN = re.compile(_CL100K_STDLIB_PATTERN)
+
+# Fallback ratio before any text has been counted
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+class HeuristicTokenizer:
+    """Dependency-free approximation of BPE token counts per pre-token piece"""
+
+    name = 'heuristic'
+
+    def count_piece(self, piece: str) -> int:
+        """Approximate the tokens in a single pre-token piece"""
+        core = piece.lstrip(' ')
+        if not core:
+            return 1
+        if core[0].isdigit():
+            return 1
+        # Letter runs may carry one leading non-letter (",name"), which usually merges in
+        if core[0].isalpha() or (len(core) > 1 and core[1].isalpha()):
+            return max(1, math.ceil(len(core) / 5))
+        if core.isspace():
+            return 1
+        return max(1, math.ceil(len(core) / 2))
+
+class BPETokenizer:
+    """Byte-pair encoding counter backed by an offline vocabulary file"""
+
+    def __init__(self, vocab_path: Path):
+        self.vocab_path = Path(vocab_path)
+        self.name = f'bpe:{self.vocab_path.name}'
+        self.ranks = self.load_vocab(self.vocab_path)
+
+    @staticmethod
+    def load_vocab(vocab_path: Path) -> Dict[bytes, int]:
+        """Load a tiktoken-format vocabulary"""
+        ranks = {}
+        with open(vocab_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                token, rank = line.split()
+                ranks[base64.b64decode(token)] = int(rank)
+        return ranks
+
+    def count_piece(self, piece: str) -> int:
+        """Count tokens by applying merges in rank order"""
+        data = piece.encode('utf-8')
+        ranks = self.ranks
+        if data in ranks:
+            return 1
+
+        parts = [data[i:i + 1] for i in range(len(data))]
+        while len(parts) > 1:
+            best_index = -1
+            best_rank = None
+            for i in range(len(parts) - 1):
+                rank = ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_index, best_rank = i, rank
+            if best_rank is None:
+                break
+            parts[best_index:best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+
+        return len(parts)
+
+class TiktokenTokenizer:
+    """Adapter for the optional tiktoken package"""
+
+    def __init__(self, encoding_name: str = 'cl100k_base'):
+        import tiktoken
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self.name = f'tiktoken:{encoding_name}'
+
+    def count_piece(self, piece: str) -> int:
+        return len(self.encoding.encode_ordinary(piece))
+
+class TokenCounter:
+    """Memoized token counting with a sampled fast path for large inputs"""
+
+    def __init__(self, tokenizer=None, memo_size: int = 65536, approximate_above: int = 256 * 1024,
+                 sample_windows: int = 8, window_size: int = 8192):
+        self.tokenizer = tokenizer or HeuristicTokenizer()
+        self.memo_size = memo_size
+        self.approximate_above = approximate_above
+        self.sample_windows = sample_windows
+        self.window_size = window_size
+
+        # Keys and enum-like values recur constantly, so counts are cached per piece
+        self.memo: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.counted_chars = 0
+        self.counted_tokens = 0
+        self.stats = {
+            'memo_hits': 0,
+            'memo_misses': 0,
+            'exact_counts': 0,
+            'approximate_counts': 0
+        }
+
+    @property
+    def chars_per_token(self) -> float:
+        """Characters per token observed so far"""
+        if self.counted_tokens:
+            return self.counted_chars / self.counted_tokens
+        return DEFAULT_CHARS_PER_TOKEN
+
+    def count(self, text: str) -> int:
+        """Count tokens, sampling instead of tokenizing everything for very large text"""
+        if not text:
+            return 0
+        if len(text) > self.approximate_above:
+            return self.count_approximate(text)
+
+        tokens = self.count_pieces(PRETOKENIZE_PATTERN.findall(text))
+        self.stats['exact_counts'] += 1
+        self.record(len(text), tokens)
+        return tokens
+
+    def count_pieces(self, pieces: Iterable[str]) -> int:
+        """Sum memoized per-piece counts"""
+        memo = self.memo
+        tokens = 0
+        lookups = 0
+        misses = 0
+
+        for piece in pieces:
+            lookups += 1
+            count = memo.get(piece)
+            if count is None:
+                misses += 1
+                count = self.tokenizer.count_piece(piece)
+                if len(memo) >= self.memo_size:
+                    memo.clear()
+                memo[piece] = count
+            tokens += count
+
+        self.stats['memo_hits'] += lookups - misses
+        self.stats['memo_misses'] += misses
+        return tokens
+
+    def count_approximate(self, text: str) -> int:
+        """Extrapolate from evenly spaced windows of the text"""
+        length = len(text)
+        step = max(self.window_size, length // self.sample_windows)
+        sampled_chars = 0
+        sampled_tokens = 0
+
+        for start in range(0, length, step):
+            window = text[start:start + self.window_size]
+            sampled_chars += len(window)
+            sampled_tokens += self.count_pieces(PRETOKENIZE_PATTERN.findall(window))
+
+        self.stats['approximate_counts'] += 1
+        self.record(sampled_chars, sampled_tokens)
+        return max(1, round(length * sampled_tokens / sampled_chars))
+
+    def truncate(self, text: str, max_tokens: int, from_end: bool = False) -> str:
+        """Longest prefix (or suffix) made of whole pre-token pieces that fits in max_tokens"""
+        pieces = list(PRETOKENIZE_PATTERN.finditer(text))
+        if from_end:
+            pieces.reverse()
+
+        used = 0
+        boundary = len(text) if from_end else 0
+        for match in pieces:
+            used += self.count_pieces((match.group(),))
+            if used > max_tokens:
+                break
+            boundary = match.start() if from_end else match.end()
+
+        return text[boundary:] if from_end else text[:boundary]
+
+    def count_batch(self, texts: Iterable[str]) -> List[int]:
+        """Count many payloads at once, sharing the piece memo across them"""
+        return [self.count(text) for text in texts]
+
+    def estimate_for_size(self, char_count: int) -> int:
+        """Estimate tokens for text of a given length from the observed ratio"""
+        if not char_count:
+            return 0
+        return max(1, math.ceil(char_count / self.chars_per_token))
+
+    def record(self, chars: int, tokens: int):
+        with self.lock:
+            self.counted_chars += chars
+            self.counted_tokens += tokens
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get counter statistics"""
+        lookups = self.stats['memo_hits'] + self.stats['memo_misses']
+        return {
+            'tokenizer': self.tokenizer.name,
+            'memo_entries': len(self.memo),
+            'memo_hit_rate': self.stats['memo_hits'] / lookups if lookups else 0.0,
+            'chars_per_token': round(self.chars_per_token, 3),
+            **self.stats
+        }
+
+# Global token counter
+_token_counter = None
+
+def create_tokenizer(spec: Optional[str] = None):
+    """Build a tokenizer from 'heuristic', 'tiktoken:<encoding>' or a vocab file path"""
+    if spec is None:
+        spec = os.environ.get('TOON_TOKENIZER')
+        if spec is None and DEFAULT_VOCAB_PATH.exists():
+            spec = str(DEFAULT_VOCAB_PATH)
+
+    if not spec or spec == 'heuristic':
+        return HeuristicTokenizer()
+    if spec.startswith('tiktoken:'):
+        return TiktokenTokenizer(spec.split(':', 1)[1])
+    return BPETokenizer(Path(os.path.expanduser(spec)))
+
+def get_token_counter() -> TokenCounter:
+    """Get or create the global token counter"""
+    global _token_counter
+    if _token_counter is None:
+        try:
+            _token_counter = TokenCounter(create_tokenizer())
+        except Exception:
+            _token_counter = TokenCounter(HeuristicTokenizer())
+    return _token_counter
+
+def set_token_counter(counter: TokenCounter):
+    """Install a custom token counter"""
+    global _token_counter
+    _token_counter = counter
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text with the global counter"""
+    return get_token_counter().count(text)
+
+def count_tokens_batch(texts: Iterable[str]) -> List[int]:
+    """Count tokens for many texts with the global counter"""
+    return get_token_counter().count_batch(texts)
+
+if __name__ == "__main__":
+    import sys
+
+    counter = get_token_counter()
+    sample = sys.argv[1] if len(sys.argv) > 1 else '{"users":[{"id":1,"name":"Alice"},{"id":2,"name":"Bob"}]}'
+    print(f"{counter.tokenizer.name}: {counter.count(sample)} tokens")
+    print(counter.get_statistics())